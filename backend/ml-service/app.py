@@ -1,10 +1,49 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from feature_extractor import FeatureExtractor
 from online_learner import OnlineLearner
 from code_quality_extractor import CodeQualityExtractor
+from prediction_batcher import PredictionBatcher
+from lru_cache import LRUCache
+from logging.handlers import QueueHandler, QueueListener
+import logging
+import orjson
 import os
+import queue
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for request parsing and jsonify"""
+
+    # numpy scalars and arrays from the vectorized paths serialize natively
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=self.OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.OPTIONS), mimetype='application/json')
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Scoring logs are enqueued on the request path and written by a background listener
+logger = logging.getLogger('scorer')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+log_handler = QueueHandler(queue.Queue())
+logger.addHandler(log_handler)
+
+def _start_log_listener():
+    global log_listener
+    log_handler.queue = queue.Queue()
+    log_listener = QueueListener(log_handler.queue, logging.StreamHandler())
+    log_listener.start()
+
+_start_log_listener()
 
 # Initialize security model
 feature_extractor = FeatureExtractor()
@@ -20,6 +59,30 @@ code_quality_learner = OnlineLearner(
 ANOMALY_THRESHOLD = float(os.getenv('ANOMALY_THRESHOLD', '0.6'))
 CODE_QUALITY_THRESHOLD = float(os.getenv('CODE_QUALITY_THRESHOLD', '0.20'))
 
+# Micro-batching: group predictions that queue up concurrently. A wait budget
+# above 0 delays every isolated request by that long, so it's off by default.
+PREDICT_MAX_BATCH = int(os.getenv('PREDICT_MAX_BATCH', '32'))
+PREDICT_MAX_WAIT_MS = float(os.getenv('PREDICT_MAX_WAIT_MS', '0'))
+
+security_batcher = PredictionBatcher(learner, PREDICT_MAX_BATCH, PREDICT_MAX_WAIT_MS)
+code_quality_batcher = PredictionBatcher(code_quality_learner, PREDICT_MAX_BATCH, PREDICT_MAX_WAIT_MS)
+
+def restart_background_threads():
+    """
+    Restart the log listener and batch workers. Threads don't survive fork,
+    so gunicorn_conf.post_fork calls this in each preforked worker.
+    """
+    _start_log_listener()
+    security_batcher.start()
+    code_quality_batcher.start()
+
+# Redelivered events skip extraction and prediction. Keys include a hash of
+# any enrichment context, since that can change between deliveries.
+SCORE_CACHE_SIZE = int(os.getenv('SCORE_CACHE_SIZE', '10000'))
+
+security_cache = LRUCache(SCORE_CACHE_SIZE)
+code_quality_cache = LRUCache(SCORE_CACHE_SIZE)
+
 @app.route('/score', methods=['POST'])
 def score_event():
     """
@@ -33,6 +96,8 @@ def score_event():
     """
     try:
         data = request.json
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Invalid event format'}), 400
 
         if 'id' in data:
             event = data
@@ -41,36 +106,40 @@ def score_event():
             event = data.get('event')
             repo_context = data.get('repo_context')
 
-        if not event or 'id' not in event:
+        if not _is_valid_event(event) or not _is_valid_context(repo_context):
             return jsonify({'error': 'Invalid event format'}), 400
 
-        event_id = str(event['id'])
-
-        features = feature_extractor.extract_features(event)
+        return jsonify(_score_events([event], [repo_context], security_batcher.predict_many)[0]), 200
 
-        if repo_context:
-            context_features = _extract_repo_context_features(repo_context, event.get('type', ''))
-            features.update(context_features)
-
-        score, prediction = learner.predict(event_id, features)
-
-        is_anomalous = score >= ANOMALY_THRESHOLD
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        result = {
-            'event_id': event_id,
-            'score': score,
-            'prediction': prediction,
-            'is_anomalous': is_anomalous,
-            'features': features,
-            'event_type': event.get('type'),
-            'repo': event.get('repo', {}).get('name'),
-            'actor': event.get('actor', {}).get('login')
-        }
+@app.route('/score/batch', methods=['POST'])
+def score_event_batch():
+    """
+    Score a batch of GitHub events in one request.
 
-        if is_anomalous:
-            print(f"🚨 ANOMALY DETECTED (score={score:.2f}): {event.get('type')} on {event.get('repo', {}).get('name')}")
+    Request body: {
+        events: list of GitHub event JSON (required),
+        repo_contexts: list of repo contexts, aligned with events (optional)
+    }
+    Response: list of /score results, in input order
+    """
+    try:
+        data = request.json
+        events = data.get('events') if isinstance(data, dict) else None
+        if not isinstance(events, list):
+            return jsonify({'error': 'Invalid batch format'}), 400
+
+        repo_contexts = data.get('repo_contexts') or [None] * len(events)
+        if not isinstance(repo_contexts, list) or len(repo_contexts) != len(events):
+            return jsonify({'error': 'Invalid batch format'}), 400
+        if not all(_is_valid_event(event) for event in events):
+            return jsonify({'error': 'Invalid event format'}), 400
+        if not all(_is_valid_context(context) for context in repo_contexts):
+            return jsonify({'error': 'Invalid batch format'}), 400
 
-        return jsonify(result), 200
+        return jsonify(_score_events(events, repo_contexts, learner.predict_many)), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -88,6 +157,8 @@ def score_code_quality():
     """
     try:
         data = request.json
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Invalid event format'}), 400
 
         if 'id' in data:
             event = data
@@ -96,76 +167,219 @@ def score_code_quality():
             event = data.get('event')
             diff_data = data.get('diff_data')
 
-        if not event or 'id' not in event:
+        if not _is_valid_event(event) or not _is_valid_context(diff_data):
             return jsonify({'error': 'Invalid event format'}), 400
 
-        event_id = str(event['id'])
-
-        features = code_quality_extractor.extract_features(event, diff_data)
+        return jsonify(_score_code_quality_events([event], [diff_data], code_quality_batcher.predict_many)[0]), 200
 
-        score, prediction = code_quality_learner.predict(event_id, features)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        is_good_practice = score >= CODE_QUALITY_THRESHOLD
+@app.route('/score/code-quality/batch', methods=['POST'])
+def score_code_quality_batch():
+    """
+    Score code quality/practices for a batch of GitHub events.
 
-        result = {
-            'event_id': event_id,
-            'score': score,
-            'prediction': prediction,
-            'is_good_practice': is_good_practice,
-            'features': features,
-            'event_type': event.get('type'),
-            'repo': event.get('repo', {}).get('name'),
-            'actor': event.get('actor', {}).get('login')
-        }
+    Request body: {
+        events: list of GitHub event JSON (required),
+        diff_data: list of diff analyses, aligned with events (optional)
+    }
+    Response: list of /score/code-quality results, in input order
+    """
+    try:
+        data = request.json
+        events = data.get('events') if isinstance(data, dict) else None
+        if not isinstance(events, list):
+            return jsonify({'error': 'Invalid batch format'}), 400
+
+        diff_datas = data.get('diff_data') or [None] * len(events)
+        if not isinstance(diff_datas, list) or len(diff_datas) != len(events):
+            return jsonify({'error': 'Invalid batch format'}), 400
+        if not all(_is_valid_event(event) for event in events):
+            return jsonify({'error': 'Invalid event format'}), 400
+        if not all(_is_valid_context(context) for context in diff_datas):
+            return jsonify({'error': 'Invalid batch format'}), 400
 
-        return jsonify(result), 200
+        return jsonify(_score_code_quality_events(events, diff_datas, code_quality_learner.predict_many)), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _is_valid_event(event) -> bool:
+    return isinstance(event, dict) and 'id' in event
+
+def _is_valid_context(context) -> bool:
+    """Enrichment context is optional, but must be an object when given"""
+    return not context or isinstance(context, dict)
+
+def _event_identity(event: dict) -> tuple:
+    """Read (event_type, repo_name, actor) once so extractors and results can share them"""
+    return (
+        event.get('type'),
+        (event.get('repo') or {}).get('name'),
+        (event.get('actor') or {}).get('login')
+    )
+
+def _context_key(*contexts) -> int:
+    """Hash enrichment context so a cached score is only reused for identical context"""
+    return hash(orjson.dumps(contexts, option=orjson.OPT_SORT_KEYS))
+
+def _score_events(events: list, repo_contexts: list, predict_many) -> list:
+    """
+    Extract security features for each event, then predict them with
+    predict_many: the micro-batcher for single events, or the learner
+    directly for a batch that is already in hand. Events already scored
+    with the same context are served from security_cache.
+    """
+    results = [None] * len(events)
+    pending = []
+    for i, (event, repo_context) in enumerate(zip(events, repo_contexts)):
+        event_id = str(event['id'])
+        identity = _event_identity(event)
+        cache_key = (event_id, _context_key(repo_context))
+
+        cached = security_cache.get(cache_key)
+        if cached is not None:
+            results[i] = _security_result(event_id, identity, *cached)
+            continue
+
+        event_type, repo_name, actor = identity
+        features = feature_extractor.extract_features(
+            event, event_type=event_type, repo_name=repo_name, actor=actor
+        )
+
+        if repo_context:
+            context_features = _extract_repo_context_features(repo_context, event_type or '')
+            features.update(context_features)
+
+        pending.append((i, cache_key, event_id, identity, features))
+
+    predictions = predict_many([p[2] for p in pending], [p[4] for p in pending])
+
+    for (i, cache_key, event_id, identity, features), (score, prediction) in zip(pending, predictions):
+        security_cache.put(cache_key, (features, score, prediction))
+        results[i] = _security_result(event_id, identity, features, score, prediction)
+
+        if results[i]['is_anomalous']:
+            logger.warning(
+                "🚨 ANOMALY DETECTED (score=%.2f): %s on %s", score, identity[0], identity[1],
+                extra={'event_id': event_id, 'score': score}
+            )
+
+    return results
+
+def _security_result(event_id: str, identity: tuple, features: dict, score: float, prediction: int) -> dict:
+    event_type, repo_name, actor = identity
+    return {
+        'event_id': event_id,
+        'score': score,
+        'prediction': prediction,
+        'is_anomalous': score >= ANOMALY_THRESHOLD,
+        'features': features,
+        'event_type': event_type,
+        'repo': repo_name,
+        'actor': actor
+    }
+
+def _score_code_quality_events(events: list, diff_datas: list, predict_many) -> list:
+    """
+    Extract code quality features for each event, then predict them with
+    predict_many, as in _score_events. Events already scored with the
+    same context are served from code_quality_cache.
+    """
+    results = [None] * len(events)
+    pending = []
+    for i, (event, diff_data) in enumerate(zip(events, diff_datas)):
+        event_id = str(event['id'])
+        identity = _event_identity(event)
+        cache_key = (event_id, _context_key(
+            diff_data, event.get('_pr_context'), event.get('_commit_context')
+        ))
+
+        cached = code_quality_cache.get(cache_key)
+        if cached is not None:
+            results[i] = _code_quality_result(event_id, identity, *cached)
+            continue
+
+        pending.append((i, cache_key, event_id, identity, event, diff_data))
+
+    feature_dicts = [
+        code_quality_extractor.extract_features(
+            event, diff_data, event_type=event_type, actor=actor
+        )
+        for _, _, _, (event_type, _, actor), event, diff_data in pending
+    ]
+    predictions = predict_many([p[2] for p in pending], feature_dicts)
+
+    for (i, cache_key, event_id, identity, _, _), features, (score, prediction) in zip(
+        pending, feature_dicts, predictions
+    ):
+        code_quality_cache.put(cache_key, (features, score, prediction))
+        results[i] = _code_quality_result(event_id, identity, features, score, prediction)
+
+    return results
+
+def _code_quality_result(event_id: str, identity: tuple, features: dict, score: float, prediction: int) -> dict:
+    event_type, repo_name, actor = identity
+    return {
+        'event_id': event_id,
+        'score': score,
+        'prediction': prediction,
+        'is_good_practice': score >= CODE_QUALITY_THRESHOLD,
+        'features': features,
+        'event_type': event_type,
+        'repo': repo_name,
+        'actor': actor
+    }
+
 def _extract_repo_context_features(repo_context: dict, event_type: str) -> dict:
     """
     Extract features from repo context (GraphQL data)
     These feed into River's anomaly detection
     """
-    features = {}
-
     metadata = repo_context.get('metadata', {})
     security = repo_context.get('security', {})
     activity = repo_context.get('activity', {})
     checks = repo_context.get('checks', {})
 
-    features['repo_age_days'] = float(metadata.get('age_days', 0))
-    features['repo_is_young'] = 1.0 if metadata.get('age_days', 999) < 30 else 0.0
-    features['repo_stars'] = float(metadata.get('stars', 0))
-    features['repo_is_unpopular'] = 1.0 if metadata.get('stars', 0) < 10 else 0.0
-
-    features['repo_no_branch_protection'] = 0.0 if security.get('hasBranchProtection', True) else 1.0
-    features['repo_is_archived'] = 1.0 if metadata.get('isArchived', False) else 0.0
-    features['repo_vuln_alerts_enabled'] = 1.0 if security.get('vulnerabilityAlertsEnabled', False) else 0.0
-
-    features['repo_unique_contributors'] = float(activity.get('uniqueContributors', 0))
-    features['repo_low_contributor_count'] = 1.0 if activity.get('uniqueContributors', 99) < 3 else 0.0
-    features['repo_recent_commit_count'] = float(activity.get('recentCommitCount', 0))
+    age_days = metadata.get('age_days')
+    stars = metadata.get('stars', 0)
+    contributors = activity.get('uniqueContributors')
+    commits = activity.get('recentCommitCount', 0)
+
+    is_young = 1.0 if age_days is not None and age_days < 30 else 0.0
+    no_branch_protection = 0.0 if security.get('hasBranchProtection', True) else 1.0
+    is_archived = 1.0 if metadata.get('isArchived', False) else 0.0
+
+    # Missing contributor count is treated as a single contributor
+    divisor = 1 if contributors is None else contributors
+
+    features = {
+        'repo_age_days': float(age_days) if age_days is not None else 0.0,
+        'repo_is_young': is_young,
+        'repo_stars': float(stars),
+        'repo_is_unpopular': 1.0 if stars < 10 else 0.0,
+        'repo_no_branch_protection': no_branch_protection,
+        'repo_is_archived': is_archived,
+        'repo_vuln_alerts_enabled': 1.0 if security.get('vulnerabilityAlertsEnabled', False) else 0.0,
+        'repo_unique_contributors': float(contributors) if contributors is not None else 0.0,
+        'repo_low_contributor_count': 1.0 if contributors is not None and contributors < 3 else 0.0,
+        'repo_recent_commit_count': float(commits),
+        'repo_young_unprotected': is_young * no_branch_protection,
+        'repo_archived_active': is_archived,
+        'repo_activity_per_contributor': min(commits / divisor, 100.0) if divisor > 0 else 0.0,
+    }
 
     if checks:
-        features['repo_check_failure_rate'] = float(checks.get('failureRate', 0))
-        features['repo_high_check_failures'] = 1.0 if checks.get('failureRate', 0) > 0.5 else 0.0
-
-    features['repo_young_unprotected'] = features['repo_is_young'] * features['repo_no_branch_protection']
-
-    features['repo_archived_active'] = features['repo_is_archived']
-
-    if activity.get('uniqueContributors', 1) > 0:
-        activity_per_contributor = activity.get('recentCommitCount', 0) / activity.get('uniqueContributors', 1)
-        features['repo_activity_per_contributor'] = min(activity_per_contributor, 100.0)
-    else:
-        features['repo_activity_per_contributor'] = 0.0
+        failure_rate = checks.get('failureRate', 0)
+        features['repo_check_failure_rate'] = float(failure_rate)
+        features['repo_high_check_failures'] = 1.0 if failure_rate > 0.5 else 0.0
 
     return features
 
 if __name__ == '__main__':
+    # Local development only; production runs under gunicorn (see gunicorn_conf.py)
     port = int(os.getenv('ML_PORT', '5001'))
     print(f"Starting ML Service on port {port}")
     print(f"Anomaly threshold: {ANOMALY_THRESHOLD}")
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_DEBUG') == '1')
@@ -1,5 +1,5 @@
-from datetime import datetime
 from typing import Dict, Any, Optional
+from time_utils import parse_iso_z
 import re
 
 class CodeQualityExtractor:
@@ -8,52 +8,127 @@ class CodeQualityExtractor:
     Separate from security features - focuses on development practices.
     """
 
+    # File extensions (after the last '.') used to classify changed files
+    SRC_EXT = frozenset({'py', 'js', 'ts', 'java', 'go', 'rs'})
+    CFG_EXT = frozenset({'json', 'yaml', 'yml', 'toml', 'env'})
+    DOC_EXT = frozenset({'md', 'txt', 'rst'})
+
+    MAIN_REFS = frozenset({'refs/heads/main', 'refs/heads/master'})
+
+    # Every feature the model expects, with its value when not computed for an event
+    _DEFAULTS = {
+        'pr_lines_added': 0.0,
+        'pr_lines_deleted': 0.0,
+        'pr_total_lines': 0.0,
+        'pr_files_changed': 0.0,
+        'pr_commits': 0.0,
+        'pr_is_tiny': 0.0,
+        'pr_is_small': 0.0,
+        'pr_is_medium': 0.0,
+        'pr_is_large': 0.0,
+        'pr_churn_ratio': 0.0,
+        'push_has_sha': 0.0,
+        'is_feature_branch': 0.0,
+        'branch_name_is_good': 1.0,
+        'pr_is_merged': 0.0,
+        'pr_has_reviewers': 0.0,
+        'pr_self_merged': 0.0,
+        'has_test_files': 0.0,
+        'has_readme_changes': 0.0,
+        'is_bot_actor': 0.0,
+        'has_commit_message': 0.0,
+        'commit_message_length': 0.0,
+        'commit_message_word_count': 0.0,
+        'has_vague_message': 0.0,
+        'has_conventional_format': 0.0,
+        'has_description_body': 0.0,
+        'has_pr_title': 0.0,
+        'pr_title_length': 0.0,
+        'has_pr_description': 0.0,
+        'pr_description_length': 0.0,
+        'pr_description_word_count': 0.0,
+        'num_test_files': 0.0,
+        'num_src_files': 0.0,
+        'num_config_files': 0.0,
+        'num_doc_files': 0.0,
+        'modifies_license': 0.0,
+        'modifies_package_lock': 0.0,
+        'file_type_diversity': 0.0,
+        'mixing_src_and_docs': 0.0,
+        'mixing_code_and_deps': 0.0,
+        'test_to_src_ratio': 0.0,
+        'adds_code_without_tests': 0.0,
+        'pr_review_count': 0.0,
+        'pr_comment_count': 0.0,
+        'pr_has_reviews': 0.0,
+        'pr_merged_quickly': 0.0,
+    }
+
     def __init__(self):
-        # Track patterns over time
-        self.repo_pr_sizes = {}  # repo -> list of PR sizes
-        self.actor_commit_patterns = {}  # actor -> stats
+        # Message/branch matchers, compiled once instead of scanning word lists per event
+        self._vague_re = re.compile(r'(fix|update|wip|test|changes|stuff)\.?', re.I)
+        self._conv_re = re.compile(r'(feat|fix|docs|style|refactor|test|chore):', re.I)
+        self._bad_branch_re = re.compile(r'test|temp|tmp|asdf|foo|bar|branch', re.I)
 
-    def extract_features(self, event: Dict[str, Any], diff_data: Optional[Dict] = None) -> Dict[str, float]:
+    def extract_features(self, event: Dict[str, Any], diff_data: Optional[Dict] = None,
+                         event_type: Optional[str] = None, actor: Optional[str] = None) -> Dict[str, float]:
         """
         Extract code quality features from event.
 
         Args:
             event: GitHub event
             diff_data: Optional diff/PR data fetched separately
+            event_type, actor: Optional, for callers that already read them from the event
         """
-        event_type = event.get('type', '')
+        if event_type is None:
+            event_type = event.get('type', '')
+        if actor is None:
+            actor = event.get('actor', {}).get('login', '')
         payload = event.get('payload', {})
-        repo_name = event.get('repo', {}).get('name', '')
-        actor = event.get('actor', {}).get('login', '')
 
-        features = {}
+        ref = payload.get('ref', '')
+        branch_name = ref.replace('refs/heads/', '') if ref else ''
+
+        # Computed for every event, enriched or not. Cheap checks go first:
+        # most events have no ref, and only bot logins contain '['.
+        always = {
+            'is_feature_branch': 0.0 if ref in self.MAIN_REFS else 1.0,
+            'branch_name_is_good': 0.0 if branch_name and self._bad_branch_re.search(branch_name) else 1.0,
+            'is_bot_actor': 1.0 if '[' in actor and '[bot]' in actor.lower() else 0.0,
+        }
 
         pr_context = event.get('_pr_context')
         commit_context = event.get('_commit_context')
 
+        # Fast path: ordinary events with no PR/commit/diff enrichment
+        if not (pr_context or commit_context or diff_data) and event_type not in ('PullRequestEvent', 'PushEvent'):
+            return {**self._DEFAULTS, **always}
+
+        features = {}
+
         if pr_context or commit_context:
             context_features = self.extract_pr_commit_features(pr_context, commit_context)
             features.update(context_features)
 
         if event_type == 'PullRequestEvent' and payload.get('pull_request'):
             pr = payload['pull_request']
-            features['pr_lines_added'] = float(pr.get('additions', 0))
-            features['pr_lines_deleted'] = float(pr.get('deletions', 0))
-            features['pr_total_lines'] = features['pr_lines_added'] + features['pr_lines_deleted']
-            features['pr_files_changed'] = float(pr.get('changed_files', 0))
-            features['pr_commits'] = float(pr.get('commits', 0))
-
-            # Size categories
-            total = features['pr_total_lines']
-            features['pr_is_tiny'] = 1.0 if total < 10 else 0.0
-            features['pr_is_small'] = 1.0 if 10 <= total < 100 else 0.0
-            features['pr_is_medium'] = 1.0 if 100 <= total < 500 else 0.0
-            features['pr_is_large'] = 1.0 if total >= 500 else 0.0
-
-            if features['pr_lines_added'] > 0:
-                features['pr_churn_ratio'] = features['pr_lines_deleted'] / features['pr_lines_added']
-            else:
-                features['pr_churn_ratio'] = 0.0
+            added = float(pr.get('additions', 0))
+            deleted = float(pr.get('deletions', 0))
+            total = added + deleted
+
+            features.update({
+                'pr_lines_added': added,
+                'pr_lines_deleted': deleted,
+                'pr_total_lines': total,
+                'pr_files_changed': float(pr.get('changed_files', 0)),
+                'pr_commits': float(pr.get('commits', 0)),
+                # Size categories
+                'pr_is_tiny': 1.0 if total < 10 else 0.0,
+                'pr_is_small': 1.0 if 10 <= total < 100 else 0.0,
+                'pr_is_medium': 1.0 if 100 <= total < 500 else 0.0,
+                'pr_is_large': 1.0 if total >= 500 else 0.0,
+                'pr_churn_ratio': deleted / added if added > 0 else 0.0,
+            })
 
         elif event_type == 'PushEvent':
             # Note: Events API doesn't include commits array, only head/before SHAs
@@ -61,13 +136,6 @@ class CodeQualityExtractor:
             # Would need separate API call to get commit details
             features['push_has_sha'] = 1.0 if payload.get('head') else 0.0
 
-        ref = payload.get('ref', '')
-        features['is_feature_branch'] = 0.0 if ref in ['refs/heads/main', 'refs/heads/master'] else 1.0
-
-        branch_name = ref.replace('refs/heads/', '') if ref else ''
-        bad_names = ['test', 'temp', 'tmp', 'asdf', 'foo', 'bar', 'branch']
-        features['branch_name_is_good'] = 0.0 if any(bad in branch_name.lower() for bad in bad_names) else 1.0
-
         if event_type == 'PullRequestEvent':
             pr = payload.get('pull_request', {})
             action = payload.get('action', '')
@@ -83,61 +151,7 @@ class CodeQualityExtractor:
             features['has_test_files'] = 1.0 if diff_data.get('has_test_files', False) else 0.0
             features['has_readme_changes'] = 1.0 if diff_data.get('has_readme_changes', False) else 0.0
 
-        features['is_bot_actor'] = 1.0 if '[bot]' in actor.lower() else 0.0
-
-        default_features = {
-            'pr_lines_added': 0.0,
-            'pr_lines_deleted': 0.0,
-            'pr_total_lines': 0.0,
-            'pr_files_changed': 0.0,
-            'pr_commits': 0.0,
-            'pr_is_tiny': 0.0,
-            'pr_is_small': 0.0,
-            'pr_is_medium': 0.0,
-            'pr_is_large': 0.0,
-            'pr_churn_ratio': 0.0,
-            'push_has_sha': 0.0,
-            'is_feature_branch': 0.0,
-            'branch_name_is_good': 1.0,
-            'pr_is_merged': 0.0,
-            'pr_has_reviewers': 0.0,
-            'pr_self_merged': 0.0,
-            'has_test_files': 0.0,
-            'has_readme_changes': 0.0,
-            'is_bot_actor': 0.0,
-            'has_commit_message': 0.0,
-            'commit_message_length': 0.0,
-            'commit_message_word_count': 0.0,
-            'has_vague_message': 0.0,
-            'has_conventional_format': 0.0,
-            'has_description_body': 0.0,
-            'has_pr_title': 0.0,
-            'pr_title_length': 0.0,
-            'has_pr_description': 0.0,
-            'pr_description_length': 0.0,
-            'pr_description_word_count': 0.0,
-            'num_test_files': 0.0,
-            'num_src_files': 0.0,
-            'num_config_files': 0.0,
-            'num_doc_files': 0.0,
-            'modifies_license': 0.0,
-            'modifies_package_lock': 0.0,
-            'file_type_diversity': 0.0,
-            'mixing_src_and_docs': 0.0,
-            'mixing_code_and_deps': 0.0,
-            'test_to_src_ratio': 0.0,
-            'adds_code_without_tests': 0.0,
-            'pr_review_count': 0.0,
-            'pr_comment_count': 0.0,
-            'pr_has_reviews': 0.0,
-            'pr_merged_quickly': 0.0,
-        }
-
-        for key, default_val in default_features.items():
-            if key not in features:
-                features[key] = default_val
-
-        return features
+        return {**self._DEFAULTS, **features, **always}
 
     def extract_pr_commit_features(self, pr_context: Optional[Dict] = None, commit_context: Optional[Dict] = None) -> Dict[str, float]:
         """
@@ -165,18 +179,8 @@ class CodeQualityExtractor:
             features['commit_message_length'] = float(len(first_message))
             features['commit_message_word_count'] = float(len(first_message.split()))
 
-            vague_patterns = ['fix', 'update', 'wip', 'test', 'changes', 'stuff']
-            is_vague = any(
-                first_message.lower().strip() == pattern or
-                first_message.lower().strip() == f'{pattern}.'
-                for pattern in vague_patterns
-            )
-            features['has_vague_message'] = 1.0 if is_vague else 0.0
-
-            conventional_prefixes = ['feat:', 'fix:', 'docs:', 'style:', 'refactor:', 'test:', 'chore:']
-            features['has_conventional_format'] = 1.0 if any(
-                first_message.lower().startswith(prefix) for prefix in conventional_prefixes
-            ) else 0.0
+            features['has_vague_message'] = 1.0 if self._vague_re.fullmatch(first_message.strip()) else 0.0
+            features['has_conventional_format'] = 1.0 if self._conv_re.match(first_message) else 0.0
 
             features['has_description_body'] = 1.0 if '\n\n' in first_message else 0.0
 
@@ -209,28 +213,47 @@ class CodeQualityExtractor:
             file_paths = [f.get('path', '') for f in pr_context['files']]
 
         if file_paths:
-            test_files = [f for f in file_paths if 'test' in f.lower() or 'spec' in f.lower()]
-            src_files = [f for f in file_paths if any(f.endswith(ext) for ext in ['.py', '.js', '.ts', '.java', '.go', '.rs'])]
-            config_files = [f for f in file_paths if any(f.endswith(ext) for ext in ['.json', '.yaml', '.yml', '.toml', '.env'])]
-            doc_files = [f for f in file_paths if any(f.endswith(ext) for ext in ['.md', '.txt', '.rst'])]
-
-            features['num_test_files'] = float(len(test_files))
-            features['num_src_files'] = float(len(src_files))
-            features['num_config_files'] = float(len(config_files))
-            features['num_doc_files'] = float(len(doc_files))
-
-            features['modifies_license'] = 1.0 if any('LICENSE' in f.upper() for f in file_paths) else 0.0
-            features['modifies_package_lock'] = 1.0 if any('package-lock.json' in f or 'yarn.lock' in f for f in file_paths) else 0.0
-
-            unique_extensions = set(f.split('.')[-1] if '.' in f else '' for f in file_paths)
-            features['file_type_diversity'] = float(len(unique_extensions)) / max(len(file_paths), 1)
-
-            features['mixing_src_and_docs'] = 1.0 if (len(src_files) > 0 and len(doc_files) > 0) else 0.0
-            features['mixing_code_and_deps'] = 1.0 if (len(src_files) > 0 and len(config_files) > 0) else 0.0
-
-            if len(src_files) > 0:
-                features['test_to_src_ratio'] = float(len(test_files)) / float(len(src_files))
-                features['adds_code_without_tests'] = 1.0 if len(test_files) == 0 else 0.0
+            num_test = num_src = num_config = num_doc = 0
+            modifies_license = modifies_package_lock = False
+            unique_extensions = set()
+
+            for f in file_paths:
+                lo = f.lower()
+                _, dot, ext = f.rpartition('.')
+                if not dot:
+                    ext = ''
+                unique_extensions.add(ext)
+
+                if 'test' in lo or 'spec' in lo:
+                    num_test += 1
+                if ext in self.SRC_EXT:
+                    num_src += 1
+                elif ext in self.CFG_EXT:
+                    num_config += 1
+                elif ext in self.DOC_EXT:
+                    num_doc += 1
+
+                if 'license' in lo:
+                    modifies_license = True
+                if 'package-lock.json' in f or 'yarn.lock' in f:
+                    modifies_package_lock = True
+
+            features['num_test_files'] = float(num_test)
+            features['num_src_files'] = float(num_src)
+            features['num_config_files'] = float(num_config)
+            features['num_doc_files'] = float(num_doc)
+
+            features['modifies_license'] = 1.0 if modifies_license else 0.0
+            features['modifies_package_lock'] = 1.0 if modifies_package_lock else 0.0
+
+            features['file_type_diversity'] = float(len(unique_extensions)) / len(file_paths)
+
+            features['mixing_src_and_docs'] = 1.0 if (num_src > 0 and num_doc > 0) else 0.0
+            features['mixing_code_and_deps'] = 1.0 if (num_src > 0 and num_config > 0) else 0.0
+
+            if num_src > 0:
+                features['test_to_src_ratio'] = float(num_test) / float(num_src)
+                features['adds_code_without_tests'] = 1.0 if num_test == 0 else 0.0
             else:
                 features['test_to_src_ratio'] = 0.0
                 features['adds_code_without_tests'] = 0.0
@@ -253,10 +276,9 @@ class CodeQualityExtractor:
             features['pr_has_reviews'] = 1.0 if pr_context.get('reviews', {}).get('totalCount', 0) > 0 else 0.0
 
             if pr_context.get('createdAt') and pr_context.get('mergedAt'):
-                from datetime import datetime
-                created = datetime.fromisoformat(pr_context['createdAt'].replace('Z', '+00:00'))
-                merged = datetime.fromisoformat(pr_context['mergedAt'].replace('Z', '+00:00'))
-                merge_time_hours = (merged - created).total_seconds() / 3600
+                created = parse_iso_z(pr_context['createdAt'])
+                merged = parse_iso_z(pr_context['mergedAt'])
+                merge_time_hours = (merged - created) / 3600
                 features['pr_merged_quickly'] = 1.0 if merge_time_hours < 1 else 0.0
             else:
                 features['pr_merged_quickly'] = 0.0
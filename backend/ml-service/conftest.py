@@ -0,0 +1,32 @@
+"""
+Shared pytest setup for ML Service tests
+"""
+import pytest
+
+WARMUP_EVENT = {
+    'id': 'warmup-0',
+    'type': 'PushEvent',
+    'repo': {'name': 'warmup/repo'},
+    'actor': {'login': 'warmup-user'},
+    'created_at': '2026-01-30T12:00:00Z',
+    'payload': {'ref': 'refs/heads/main', 'forced': False}
+}
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The app module; tests that need it are skipped if its third-party dependencies aren't installed"""
+    for dependency in ('flask', 'river', 'orjson'):
+        pytest.importorskip(dependency)
+
+    import app
+    return app
+
+@pytest.fixture(scope='session')
+def client(app_module):
+    """Create one test client shared by every test"""
+    app = app_module.app
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        # Score one event up front, so no test pays for first-request setup
+        client.post('/score', json=WARMUP_EVENT)
+        yield client
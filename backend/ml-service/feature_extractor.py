@@ -1,6 +1,85 @@
-from datetime import datetime
-from typing import Dict, Any
+from collections import deque
+from itertools import chain
+from typing import Dict, Any, List, Optional, Tuple
+from time_utils import parse_timestamp
+from lru_cache import LRUCache
+import bisect
 import hashlib
+import logging
+import numpy as np
+import re
+import time
+
+logger = logging.getLogger('scorer.features')
+
+# Seconds between warnings about events with an unparseable created_at
+INVALID_TIMESTAMP_LOG_INTERVAL = 60.0
+
+POPULAR_REPOS = (
+    'react', 'vue', 'angular', 'svelte', 'next.js', 'nuxt', 'gatsby',
+    'bootstrap', 'tailwindcss', 'jquery', 'three.js', 'd3', 'chart.js',
+    'axios', 'lodash', 'moment', 'date-fns', 'redux', 'mobx',
+    'webpack', 'vite', 'babel', 'eslint', 'prettier', 'typescript',
+
+    'nodejs', 'express', 'nest', 'fastify', 'socket.io', 'mongoose',
+    'sequelize', 'typeorm', 'pm2', 'nodemon', 'commander', 'chalk',
+    'winston', 'passport', 'jsonwebtoken', 'puppeteer', 'playwright',
+
+    'python', 'django', 'flask', 'fastapi', 'tornado', 'celery',
+    'tensorflow', 'pytorch', 'keras', 'scikit-learn', 'pandas', 'numpy',
+    'scipy', 'matplotlib', 'seaborn', 'opencv', 'pillow', 'requests',
+    'beautifulsoup', 'selenium', 'scrapy', 'sqlalchemy', 'pydantic',
+    'transformers', 'huggingface', 'langchain', 'auto-gpt', 'openai',
+
+    'docker', 'kubernetes', 'terraform', 'ansible', 'jenkins', 'gitlab',
+    'redis', 'mongodb', 'postgresql', 'mysql', 'elasticsearch', 'kafka',
+    'rabbitmq', 'nginx', 'apache', 'linux', 'ubuntu', 'alpine',
+    'prometheus', 'grafana', 'datadog', 'aws-cli', 'azure-cli',
+
+    'golang', 'rust', 'ruby', 'php', 'java', 'kotlin', 'swift', 'dart',
+    'flutter', 'react-native', 'electron', 'tauri', 'dotnet', 'csharp',
+    'homebrew', 'npm', 'yarn', 'pnpm', 'pip', 'cargo', 'gem'
+)
+
+# Each popular name indexed under every copy of itself with one character
+# masked out: 'react' -> '\0eact', 'r\0act', ... A name one substitution
+# away from a popular name shares exactly one of these keys with it. Values
+# are (list position, masked character), in list order.
+_ONE_OFF_POPULAR = {}
+for _index, _popular in enumerate(POPULAR_REPOS):
+    for _i, _char in enumerate(_popular):
+        _ONE_OFF_POPULAR.setdefault(_popular[:_i] + '\0' + _popular[_i + 1:], []).append((_index, _char))
+
+_POPULAR_LENGTHS = frozenset(len(_popular) for _popular in POPULAR_REPOS)
+
+# 'reactjs', 'pyflask', ... -> position of the first popular name producing it
+_DECORATED_POPULAR = {}
+for _index, _popular in enumerate(POPULAR_REPOS):
+    for _name in (_popular + 'js', _popular + 'py', 'js' + _popular, 'py' + _popular):
+        _DECORATED_POPULAR.setdefault(_name, _index)
+
+_PACKAGE_FILES = (
+    'package.json', 'package-lock.json', 'yarn.lock',
+    'requirements.txt', 'setup.py', 'Pipfile', 'Pipfile.lock',
+    'Gemfile', 'Gemfile.lock',
+    'pom.xml', 'build.gradle',
+    'go.mod', 'go.sum',
+    'Cargo.toml', 'Cargo.lock'
+)
+
+_OBFUSCATION_INDICATORS = ('.min.', '.pack.', '.obf.', 'base64', 'encrypted', 'encoded')
+_MINIFIED_SUFFIXES = ('.min.js', '.min.css')
+
+_BINARY_SUFFIXES = ('.exe', '.dll', '.so', '.dylib', '.bin')
+_SOURCE_SUFFIXES = ('.zip', '.tar.gz', '.tar', 'source')
+
+_ASCII_DIGITS = b'0123456789'
+
+# One alternation per needle set, so each path is scanned once in C rather
+# than once per needle
+_PACKAGE_FILE_RE = re.compile('|'.join(map(re.escape, _PACKAGE_FILES)))
+_OBFUSCATION_RE = re.compile('|'.join(map(re.escape, _OBFUSCATION_INDICATORS)))
+_SECURITY_ACTION_RE = re.compile('vulnerability|security|protection|authentication')
 
 class FeatureExtractor:
     """
@@ -12,6 +91,27 @@ class FeatureExtractor:
     - Bots
     """
 
+    MAIN_REFS = frozenset({'refs/heads/main', 'refs/heads/master'})
+    MAIN_BRANCHES = frozenset({'main', 'master'})
+    FAILED_CONCLUSIONS = frozenset({'failure', 'timed_out', 'cancelled'})
+
+    FEATURE_NAMES = (
+        'is_force_push', 'is_main_branch', 'force_push_to_main', 'force_push_frequency',
+        'is_workflow_failure', 'workflow_failure_streak',
+        'issue_burst_ratio', 'issue_spam_by_actor',
+        'bot_suspicion_score', 'is_new_account', 'rapid_fire_events',
+        'is_branch_deletion', 'is_workflow_file_change', 'is_large_commit', 'is_empty_commit',
+        'is_fork_event', 'suspicious_fork',
+        'oauth_app_installed', 'oauth_restrictions_disabled', 'auto_approve_tokens_enabled',
+        'repo_visibility_changed_to_public', 'repo_download_event', 'secrets_accessed',
+        'workflow_action_version_changed', 'action_from_unverified_source', 'workflow_secret_exposure_risk',
+        'admin_role_granted', 'bulk_permission_grants', 'org_security_settings_changed',
+        'package_file_modified', 'dependency_confusion_risk', 'suspicious_release_pattern',
+        'obfuscated_code_detected',
+        'typosquatting_similarity', 'fork_divergence_ratio', 'contributor_pattern_mismatch',
+    )
+    _DEFAULT_FEATURES = dict.fromkeys(FEATURE_NAMES, 0.0)
+
     def __init__(self):
         self.issue_tracking = {}
         self.issue_baselines = {}
@@ -21,81 +121,153 @@ class FeatureExtractor:
         self.actor_event_count = {}
         self.last_event_time = {}
 
-    def extract_features(self, event: Dict[str, Any]) -> Dict[str, float]:
+        # Both depend only on the login / repo name, which recur heavily in a stream
+        self._login_bot_scores = LRUCache(4096)
+        self._typosquatting_scores = LRUCache(4096)
+
+        self._invalid_timestamps = 0
+        self._invalid_timestamp_logged_at = float('-inf')
+
+        # event_type -> (feature_name, check(payload)) for the features that
+        # can be non-zero for that type. PushEvent commit checks share one
+        # pass in _scan_push_commits
+        self._dispatch = {
+            'PushEvent': (
+                ('is_force_push', self._is_force_push),
+            ),
+            'WorkflowRunEvent': (
+                ('is_workflow_failure', self._is_workflow_failure),
+                ('secrets_accessed', self._check_secrets_access),
+            ),
+            'DeleteEvent': (
+                ('is_branch_deletion', self._is_branch_deletion),
+            ),
+            'IntegrationInstallationEvent': (
+                ('oauth_app_installed', self._is_oauth_app_installed),
+            ),
+            'OrgConfigEvent': (
+                ('oauth_restrictions_disabled', self._is_oauth_restrictions_disabled),
+                ('auto_approve_tokens_enabled', self._is_auto_approve_enabled),
+            ),
+            'RepositoryEvent': (
+                ('repo_visibility_changed_to_public', self._is_visibility_changed_to_public),
+                ('org_security_settings_changed', self._is_security_settings_changed),
+            ),
+            'MemberEvent': (
+                ('admin_role_granted', self._is_member_admin_granted),
+            ),
+            'OrganizationEvent': (
+                ('admin_role_granted', self._is_org_admin_granted),
+                ('org_security_settings_changed', self._is_security_settings_changed),
+            ),
+            'ReleaseEvent': (
+                ('suspicious_release_pattern', self._is_suspicious_release),
+            ),
+            'ForkEvent': (
+                ('fork_divergence_ratio', self._calculate_fork_divergence),
+                ('contributor_pattern_mismatch', self._check_contributor_mismatch),
+            ),
+        }
+
+    def extract_features(self, event: Dict[str, Any], event_type: Optional[str] = None,
+                         repo_name: Optional[str] = None, actor: Optional[str] = None) -> Dict[str, float]:
         """
         Convert raw GitHub event to feature vector.
         Returns dict of feature_name -> value
+
+        event_type, repo_name and actor may be passed by callers that have
+        already read them from the event; otherwise they're read here.
         """
-        event_type = event.get('type', '')
+        if event_type is None:
+            event_type = event.get('type', '')
+        if repo_name is None:
+            repo_name = event.get('repo', {}).get('name', '')
+        if actor is None:
+            actor = event.get('actor', {}).get('login', '')
         payload = event.get('payload', {})
-        repo_name = event.get('repo', {}).get('name', '')
-        actor = event.get('actor', {}).get('login', '')
         created_at = event.get('created_at', '')
 
-        features = {}
+        # Epoch seconds or an ISO string, parsed once for every time-based feature; None if malformed
+        try:
+            ts = parse_timestamp(created_at)
+        except (TypeError, ValueError):
+            ts = None
+
+        features = self._DEFAULT_FEATURES.copy()
+
+        # Only the event-specific checks that can fire for this type run;
+        # everything else keeps its default
+        for name, fn in self._dispatch.get(event_type, ()):
+            features[name] = fn(payload)
+        if event_type == 'PushEvent':
+            features.update(self._scan_push_commits(payload))
 
-        features['is_force_push'] = self._is_force_push(event_type, payload)
         features['is_main_branch'] = self._is_main_branch(payload)
         features['force_push_to_main'] = features['is_force_push'] * features['is_main_branch']
-        features['force_push_frequency'] = self._get_force_push_frequency(repo_name)
+        features['force_push_frequency'] = self._get_force_push_frequency(repo_name, ts)
 
-        features['is_workflow_failure'] = self._is_workflow_failure(event_type, payload)
         features['workflow_failure_streak'] = self._update_workflow_streak(repo_name, features['is_workflow_failure'])
 
-        features['issue_burst_ratio'] = self._calculate_issue_burst(event_type, repo_name, actor, created_at)
-        features['issue_spam_by_actor'] = self._detect_issue_spam_by_actor(event_type, repo_name, actor)
+        if event_type == 'IssuesEvent':
+            features['issue_burst_ratio'] = self._calculate_issue_burst(repo_name, actor, ts)
+            features['issue_spam_by_actor'] = self._detect_issue_spam_by_actor(repo_name, actor)
 
-        features['bot_suspicion_score'] = self._calculate_bot_suspicion(actor, created_at)
+        features['bot_suspicion_score'] = self._calculate_bot_suspicion(actor)
         features['is_new_account'] = self._is_new_account(actor)
-        features['rapid_fire_events'] = self._detect_rapid_fire(actor, created_at)
-
-        features['is_branch_deletion'] = self._is_branch_deletion(event_type, payload)
-        features['is_workflow_file_change'] = self._is_workflow_file_change(event_type, payload)
-        features['is_large_commit'] = self._is_large_commit(event_type, payload)
-        features['is_empty_commit'] = self._is_empty_commit(event_type, payload)
-
-        features['is_fork_event'] = 1.0 if event_type == 'ForkEvent' else 0.0
-        features['suspicious_fork'] = features['is_fork_event'] * features['bot_suspicion_score']
+        features['rapid_fire_events'] = self._detect_rapid_fire(actor, ts)
 
-        features['oauth_app_installed'] = self._is_oauth_app_installed(event_type, payload)
-        features['oauth_restrictions_disabled'] = self._is_oauth_restrictions_disabled(event_type, payload)
-        features['auto_approve_tokens_enabled'] = self._is_auto_approve_enabled(event_type, payload)
-
-        features['repo_visibility_changed_to_public'] = self._is_visibility_changed_to_public(event_type, payload)
-        features['repo_download_event'] = self._is_repo_download(event_type)
-        features['secrets_accessed'] = self._check_secrets_access(event_type, payload)
-
-        features['workflow_action_version_changed'] = self._is_action_version_changed(event_type, payload)
-        features['action_from_unverified_source'] = self._is_unverified_action(event_type, payload)
-        features['workflow_secret_exposure_risk'] = self._check_workflow_secret_exposure(event_type, payload)
-
-        features['admin_role_granted'] = self._is_admin_role_granted(event_type, payload)
-        features['bulk_permission_grants'] = self._detect_bulk_permissions(event_type, payload)
-        features['org_security_settings_changed'] = self._is_security_settings_changed(event_type, payload)
-
-        features['package_file_modified'] = self._is_package_file_modified(event_type, payload)
-        features['dependency_confusion_risk'] = self._check_dependency_confusion(event_type, payload)
-        features['suspicious_release_pattern'] = self._is_suspicious_release(event_type, payload)
-        features['obfuscated_code_detected'] = self._detect_obfuscated_code(event_type, payload)
+        if event_type == 'ForkEvent':
+            features['is_fork_event'] = 1.0
+            features['suspicious_fork'] = features['bot_suspicion_score']
 
         features['typosquatting_similarity'] = self._check_typosquatting(repo_name)
-        features['fork_divergence_ratio'] = self._calculate_fork_divergence(event_type, payload)
-        features['contributor_pattern_mismatch'] = self._check_contributor_mismatch(event_type, payload)
 
-        self._update_tracking(event, repo_name, actor, created_at)
+        if ts is None:
+            self._log_invalid_timestamp(created_at)
+        else:
+            self._update_tracking(event_type, payload, repo_name, actor, ts)
 
         return features
 
-    def _get_force_push_frequency(self, repo_name: str) -> float:
-        """Returns count of force pushes in last hour"""
-        if repo_name not in self.force_push_tracking:
+    def extract_features_batch(self, events: List[Dict[str, Any]]) -> Tuple[np.ndarray, Tuple[str, ...]]:
+        """
+        Extract features for a list of events, for bulk replay and retraining.
+
+        Events are processed in order, so tracking state advances exactly as
+        if each had gone through extract_features.
+
+        Returns:
+            ((N, F) float32 matrix, feature names for its columns)
+        """
+        X = np.empty((len(events), len(self.FEATURE_NAMES)), dtype=np.float32)
+        for i, event in enumerate(events):
+            X[i] = self.extract_features_vector(event)
+        return X, self.FEATURE_NAMES
+
+    def extract_features_vector(self, event: Dict[str, Any], event_type: Optional[str] = None,
+                                repo_name: Optional[str] = None, actor: Optional[str] = None) -> np.ndarray:
+        """Same as extract_features, as a float32 vector in FEATURE_NAMES order"""
+        features = self.extract_features(event, event_type, repo_name, actor)
+        return np.fromiter((features[name] for name in self.FEATURE_NAMES), dtype=np.float32, count=len(self.FEATURE_NAMES))
+
+    @classmethod
+    def as_dict(cls, vector: np.ndarray) -> Dict[str, float]:
+        """Feature dict for a vector from extract_features_vector"""
+        return dict(zip(cls.FEATURE_NAMES, vector.tolist()))
+
+    def _get_force_push_frequency(self, repo_name: str, ts: Optional[float]) -> float:
+        """Returns count of force pushes in the hour before the event"""
+        timestamps = self.force_push_tracking.get(repo_name)
+        if timestamps is None:
             return 0.0
 
-        now = datetime.now().timestamp()
+        now = ts if ts is not None else time.time()
         cutoff = now - 3600
 
-        recent = [ts for ts in self.force_push_tracking[repo_name] if ts > cutoff]
-        return float(len(recent))
+        # Events can arrive out of order, so the window (cutoff, now] is counted
+        # rather than trimmed, ignoring pushes later than the event; the deque
+        # is bounded by its maxlen
+        return float(bisect.bisect_right(timestamps, now) - bisect.bisect_right(timestamps, cutoff))
 
     def _update_workflow_streak(self, repo_name: str, is_failure: float) -> float:
         """Update and return workflow failure streak"""
@@ -110,91 +282,63 @@ class FeatureExtractor:
 
         return float(self.workflow_failures.get(repo_name, 0))
 
-    def _is_force_push(self, event_type: str, payload: Dict) -> float:
+    def _is_force_push(self, payload: Dict) -> float:
         """Detect force pushes"""
-        if event_type != 'PushEvent':
-            return 0.0
-
         forced = payload.get('forced', False)
         return 1.0 if forced else 0.0
 
     def _is_main_branch(self, payload: Dict) -> float:
         ref = payload.get('ref', '')
-        main_branches = ['refs/heads/main', 'refs/heads/master']
-        return 1.0 if ref in main_branches else 0.0
-
-    def _is_workflow_failure(self, event_type: str, payload: Dict) -> float:
-        if event_type != 'WorkflowRunEvent':
-            return 0.0
+        return 1.0 if ref in self.MAIN_REFS else 0.0
 
+    def _is_workflow_failure(self, payload: Dict) -> float:
         workflow_run = payload.get('workflow_run', {})
         conclusion = workflow_run.get('conclusion', '')
 
-        failures = ['failure', 'timed_out', 'cancelled']
-        return 1.0 if conclusion in failures else 0.0
+        return 1.0 if conclusion in self.FAILED_CONCLUSIONS else 0.0
 
-    def _calculate_issue_burst(self, event_type: str, repo_name: str, actor: str, timestamp_str: str) -> float:
+    def _calculate_issue_burst(self, repo_name: str, actor: str, ts: Optional[float]) -> float:
         """Calculate issue burst ratio: current rate vs baseline"""
-        if event_type != 'IssuesEvent':
+        if ts is None:
             return 0.0
 
-        if repo_name not in self.issue_tracking:
+        tracking = self.issue_tracking.get(repo_name)
+        if tracking is None:
             return 0.0
 
-        try:
-            now = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).timestamp()
-            cutoff_5min = now - 300
-            cutoff_1h = now - 3600
-
-            recent_5min = [ts for ts in self.issue_tracking[repo_name]['timestamps'] if ts > cutoff_5min]
-            recent_1h = [ts for ts in self.issue_tracking[repo_name]['timestamps'] if ts > cutoff_1h]
+        cutoff_5min = ts - 300
 
-            baseline = self.issue_baselines.get(repo_name, 1.0)
-            current_rate = len(recent_5min) * 12
+        timestamps = tracking['timestamps']
+        recent_5min = len(timestamps) - bisect.bisect_right(timestamps, cutoff_5min)
 
-            if baseline > 0:
-                ratio = current_rate / baseline
-            else:
-                ratio = float(len(recent_5min))
+        baseline = self.issue_baselines.get(repo_name, 1.0)
+        current_rate = recent_5min * 12
 
-            return min(ratio, 10.0)
-
-        except:
-            return 0.0
+        if baseline > 0:
+            ratio = current_rate / baseline
+        else:
+            ratio = float(recent_5min)
 
-    def _detect_issue_spam_by_actor(self, event_type: str, repo_name: str, actor: str) -> float:
-        if event_type != 'IssuesEvent':
-            return 0.0
+        return min(ratio, 10.0)
 
-        if repo_name not in self.issue_tracking:
+    def _detect_issue_spam_by_actor(self, repo_name: str, actor: str) -> float:
+        tracking = self.issue_tracking.get(repo_name)
+        if tracking is None:
             return 0.0
 
-        actor_counts = self.issue_tracking[repo_name].get('actor_counts', {})
+        actor_counts = tracking.get('actor_counts', {})
         return float(actor_counts.get(actor, 0))
 
-    def _calculate_bot_suspicion(self, actor: str, timestamp_str: str) -> float:
-        score = 0.0
+    def _calculate_bot_suspicion(self, actor: str) -> float:
+        # The login-only part of the score is memoized; activity is added per event
+        score = self._login_bot_scores.get(actor)
+        if score is None:
+            score = _login_bot_score(actor)
+            self._login_bot_scores.put(actor, score)
 
-        if '[bot]' in actor.lower():
-            score += 0.5
-        if 'bot' in actor.lower() and '[bot]' not in actor.lower():
-            score += 0.3
-        if actor.endswith('-bot') or actor.startswith('bot-'):
-            score += 0.4
-
-        if actor.replace('-', '').replace('_', '').isdigit():
-            score += 0.3
-        if len(actor) < 4:
-            score += 0.2
-        digit_count = sum(c.isdigit() for c in actor)
-        if digit_count > len(actor) * 0.3 and digit_count > 3:
+        if self.actor_event_count.get(actor, 0) > 50:
             score += 0.2
 
-        if actor in self.actor_event_count:
-            event_count = self.actor_event_count[actor]
-            if event_count > 50:
-                score += 0.2
-
         return min(score, 1.0)
 
     def _is_new_account(self, actor: str) -> float:
@@ -206,342 +350,270 @@ class FeatureExtractor:
             return 1.0
         return 0.0
 
-    def _detect_rapid_fire(self, actor: str, timestamp_str: str) -> float:
-        try:
-            now = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).timestamp()
-
-            if actor not in self.last_event_time:
-                return 0.0
-
-            last_event = self.last_event_time[actor]
-            time_diff = now - last_event
-
-            if time_diff < 5:
-                return 1.0
+    def _detect_rapid_fire(self, actor: str, ts: Optional[float]) -> float:
+        last_event = self.last_event_time.get(actor)
+        if ts is None or last_event is None:
             return 0.0
 
-        except:
-            return 0.0
+        time_diff = ts - last_event
 
-    def _is_branch_deletion(self, event_type: str, payload: Dict) -> float:
-        if event_type != 'DeleteEvent':
-            return 0.0
+        if time_diff < 5:
+            return 1.0
+        return 0.0
 
+    def _is_branch_deletion(self, payload: Dict) -> float:
         ref_type = payload.get('ref_type', '')
         ref = payload.get('ref', '')
 
-        if ref_type == 'branch' and ref in ['main', 'master']:
+        if ref_type == 'branch' and ref in self.MAIN_BRANCHES:
             return 1.0
         if ref_type == 'branch':
             return 0.5
 
         return 0.0
 
-    def _is_workflow_file_change(self, event_type: str, payload: Dict) -> float:
-        if event_type != 'PushEvent':
-            return 0.0
-
-        commits = payload.get('commits', [])
-        for commit in commits:
-            for file_list_key in ['added', 'modified', 'removed']:
-                files = commit.get(file_list_key, [])
-                for file_path in files:
-                    if '.github/workflows/' in file_path:
-                        return 1.0
-
-        return 0.0
+    def _scan_push_commits(self, payload: Dict) -> Dict[str, float]:
+        """
+        Commit-level PushEvent features, from a single walk over each
+        commit's files
+        """
+        workflow_change = large = empty = action_version = False
+        secret_exposure = package_file = obfuscated = False
 
-    def _is_large_commit(self, event_type: str, payload: Dict) -> float:
-        if event_type != 'PushEvent':
-            return 0.0
+        for commit in payload.get('commits', ()):
+            added = commit.get('added', ())
+            modified = commit.get('modified', ())
+            removed = commit.get('removed', ())
 
-        commits = payload.get('commits', [])
-        for commit in commits:
-            total_files = (
-                len(commit.get('added', [])) +
-                len(commit.get('modified', [])) +
-                len(commit.get('removed', []))
-            )
+            total_files = len(added) + len(modified) + len(removed)
             if total_files > 100:
-                return 1.0
-
-        return 0.0
-
-    def _is_empty_commit(self, event_type: str, payload: Dict) -> float:
-        if event_type != 'PushEvent':
-            return 0.0
+                large = True
+            elif total_files == 0:
+                empty = True
 
-        commits = payload.get('commits', [])
-        for commit in commits:
-            total_files = (
-                len(commit.get('added', [])) +
-                len(commit.get('modified', [])) +
-                len(commit.get('removed', []))
-            )
-            if total_files == 0:
-                return 1.0
-
-        return 0.0
-
-    def _is_oauth_app_installed(self, event_type: str, payload: Dict) -> float:
-        if event_type == 'IntegrationInstallationEvent':
+            mentions_secret = None
+            for file_path in chain(added, modified):
+                if '.github/workflows/' in file_path:
+                    workflow_change = True
+                    if 'uses:' in file_path or '@' in file_path:
+                        action_version = True
+                    if mentions_secret is None:
+                        message = commit.get('message', '').lower()
+                        mentions_secret = 'secret' in message or 'token' in message or 'password' in message
+                    if mentions_secret:
+                        secret_exposure = True
+
+                if not package_file and _PACKAGE_FILE_RE.search(file_path):
+                    package_file = True
+
+                if not obfuscated:
+                    if _OBFUSCATION_RE.search(file_path.lower()) and not file_path.endswith(_MINIFIED_SUFFIXES):
+                        obfuscated = True
+
+            if not workflow_change:
+                workflow_change = any('.github/workflows/' in file_path for file_path in removed)
+
+        return {
+            'is_workflow_file_change': 1.0 if workflow_change else 0.0,
+            'is_large_commit': 1.0 if large else 0.0,
+            'is_empty_commit': 1.0 if empty else 0.0,
+            'workflow_action_version_changed': 1.0 if action_version else 0.0,
+            'workflow_secret_exposure_risk': 0.5 if secret_exposure else 0.0,
+            'package_file_modified': 1.0 if package_file else 0.0,
+            'obfuscated_code_detected': 0.5 if obfuscated else 0.0,
+        }
+
+    def _is_oauth_app_installed(self, payload: Dict) -> float:
+        return 1.0
+
+    def _is_oauth_restrictions_disabled(self, payload: Dict) -> float:
+        action = payload.get('action', '')
+        if 'oauth' in action.lower() and 'disable' in action.lower():
             return 1.0
         return 0.0
 
-    def _is_oauth_restrictions_disabled(self, event_type: str, payload: Dict) -> float:
-        if event_type == 'OrgConfigEvent':
-            action = payload.get('action', '')
-            if 'oauth' in action.lower() and 'disable' in action.lower():
-                return 1.0
-        return 0.0
-
-    def _is_auto_approve_enabled(self, event_type: str, payload: Dict) -> float:
-        if event_type == 'OrgConfigEvent':
-            action = payload.get('action', '')
-            if 'auto_approve' in action.lower():
-                return 1.0
-        return 0.0
-
-    def _is_visibility_changed_to_public(self, event_type: str, payload: Dict) -> float:
-        if event_type == 'RepositoryEvent':
-            action = payload.get('action', '')
-            repository = payload.get('repository', {})
-            if action == 'publicized' or (repository.get('private') == False and action in ['edited', 'changed']):
-                return 1.0
-        return 0.0
-
-    def _is_repo_download(self, event_type: str) -> float:
-        return 0.0
-
-    def _check_secrets_access(self, event_type: str, payload: Dict) -> float:
-        if event_type == 'WorkflowRunEvent':
-            workflow = payload.get('workflow_run', {})
-            if workflow.get('permissions', {}).get('secrets') == 'write':
-                return 1.0
-        return 0.0
-
-    def _is_action_version_changed(self, event_type: str, payload: Dict) -> float:
-        if event_type != 'PushEvent':
-            return 0.0
-
-        commits = payload.get('commits', [])
-        for commit in commits:
-            files = commit.get('modified', []) + commit.get('added', [])
-            for file_path in files:
-                if '.github/workflows/' in file_path and ('uses:' in str(file_path) or '@' in str(file_path)):
-                    return 1.0
-        return 0.0
-
-    def _is_unverified_action(self, event_type: str, payload: Dict) -> float:
+    def _is_auto_approve_enabled(self, payload: Dict) -> float:
+        action = payload.get('action', '')
+        if 'auto_approve' in action.lower():
+            return 1.0
         return 0.0
 
-    def _check_workflow_secret_exposure(self, event_type: str, payload: Dict) -> float:
-        if event_type != 'PushEvent':
-            return 0.0
-
-        commits = payload.get('commits', [])
-        for commit in commits:
-            message = commit.get('message', '').lower()
-            files = commit.get('modified', []) + commit.get('added', [])
-
-            for file_path in files:
-                if '.github/workflows/' in file_path:
-                    if 'secret' in message or 'token' in message or 'password' in message:
-                        return 0.5
-
+    def _is_visibility_changed_to_public(self, payload: Dict) -> float:
+        action = payload.get('action', '')
+        repository = payload.get('repository', {})
+        if action == 'publicized' or (repository.get('private') == False and action in ['edited', 'changed']):
+            return 1.0
         return 0.0
 
-    def _is_admin_role_granted(self, event_type: str, payload: Dict) -> float:
-        if event_type == 'MemberEvent':
-            permission = payload.get('member', {}).get('permissions', {})
-            if permission.get('admin') == True:
-                return 1.0
-        if event_type == 'OrganizationEvent':
-            action = payload.get('action', '')
-            if action == 'member_invited' or action == 'member_added':
-                role = payload.get('membership', {}).get('role', '')
-                if role == 'admin':
-                    return 1.0
+    def _check_secrets_access(self, payload: Dict) -> float:
+        workflow = payload.get('workflow_run', {})
+        if workflow.get('permissions', {}).get('secrets') == 'write':
+            return 1.0
         return 0.0
 
-    def _detect_bulk_permissions(self, event_type: str, payload: Dict) -> float:
+    def _is_member_admin_granted(self, payload: Dict) -> float:
+        permission = payload.get('member', {}).get('permissions', {})
+        if permission.get('admin') == True:
+            return 1.0
         return 0.0
 
-    def _is_security_settings_changed(self, event_type: str, payload: Dict) -> float:
-        if event_type in ['RepositoryEvent', 'OrganizationEvent']:
-            action = payload.get('action', '')
-            security_keywords = ['vulnerability', 'security', 'protection', 'authentication']
-            if any(keyword in action.lower() for keyword in security_keywords):
+    def _is_org_admin_granted(self, payload: Dict) -> float:
+        action = payload.get('action', '')
+        if action == 'member_invited' or action == 'member_added':
+            role = payload.get('membership', {}).get('role', '')
+            if role == 'admin':
                 return 1.0
         return 0.0
 
-    def _is_package_file_modified(self, event_type: str, payload: Dict) -> float:
-        if event_type != 'PushEvent':
-            return 0.0
-
-        package_files = [
-            'package.json', 'package-lock.json', 'yarn.lock',
-            'requirements.txt', 'setup.py', 'Pipfile', 'Pipfile.lock',
-            'Gemfile', 'Gemfile.lock',
-            'pom.xml', 'build.gradle',
-            'go.mod', 'go.sum',
-            'Cargo.toml', 'Cargo.lock'
-        ]
-
-        commits = payload.get('commits', [])
-        for commit in commits:
-            files = commit.get('modified', []) + commit.get('added', [])
-            for file_path in files:
-                if any(pkg_file in file_path for pkg_file in package_files):
-                    return 1.0
-
-        return 0.0
-
-    def _check_dependency_confusion(self, event_type: str, payload: Dict) -> float:
-        """Check for potential dependency confusion attacks"""
+    def _is_security_settings_changed(self, payload: Dict) -> float:
+        action = payload.get('action', '')
+        if _SECURITY_ACTION_RE.search(action.lower()):
+            return 1.0
         return 0.0
 
-    def _is_suspicious_release(self, event_type: str, payload: Dict) -> float:
+    def _is_suspicious_release(self, payload: Dict) -> float:
         """Detect suspicious release patterns"""
-        if event_type == 'ReleaseEvent':
-            release = payload.get('release', {})
-            assets = release.get('assets', [])
-
-            has_binaries = any(
-                asset.get('name', '').endswith(('.exe', '.dll', '.so', '.dylib', '.bin'))
-                for asset in assets
-            )
-
-            has_source = any(
-                asset.get('name', '').endswith(('.zip', '.tar.gz', '.tar', 'source'))
-                for asset in assets
-            )
-
-            if has_binaries and not has_source:
-                return 1.0
-
-        return 0.0
-
-    def _detect_obfuscated_code(self, event_type: str, payload: Dict) -> float:
-        """Detect potential obfuscated/encoded code"""
-        if event_type != 'PushEvent':
-            return 0.0
-
-        commits = payload.get('commits', [])
-        for commit in commits:
-            files = commit.get('added', []) + commit.get('modified', [])
-
-            obfuscation_indicators = [
-                '.min.', '.pack.', '.obf.', 'base64', 'encrypted', 'encoded'
-            ]
-
-            for file_path in files:
-                file_lower = file_path.lower()
-                if any(indicator in file_lower for indicator in obfuscation_indicators):
-                    if not (file_path.endswith('.min.js') or file_path.endswith('.min.css')):
-                        return 0.5
+        release = payload.get('release', {})
+        assets = release.get('assets', ())
+
+        # Binaries with no source archive; any source archive clears the release
+        has_binaries = False
+        for asset in assets:
+            name = asset.get('name', '')
+            if name.endswith(_SOURCE_SUFFIXES):
+                return 0.0
+            if name.endswith(_BINARY_SUFFIXES):
+                has_binaries = True
 
-        return 0.0
+        return 1.0 if has_binaries else 0.0
 
     def _check_typosquatting(self, repo_name: str) -> float:
         """Check if repo name is similar to popular repositories"""
-        popular_repos = [
-            'react', 'vue', 'angular', 'svelte', 'next.js', 'nuxt', 'gatsby',
-            'bootstrap', 'tailwindcss', 'jquery', 'three.js', 'd3', 'chart.js',
-            'axios', 'lodash', 'moment', 'date-fns', 'redux', 'mobx',
-            'webpack', 'vite', 'babel', 'eslint', 'prettier', 'typescript',
-            
-            'nodejs', 'express', 'nest', 'fastify', 'socket.io', 'mongoose',
-            'sequelize', 'typeorm', 'pm2', 'nodemon', 'commander', 'chalk',
-            'winston', 'passport', 'jsonwebtoken', 'puppeteer', 'playwright',
-            
-            'python', 'django', 'flask', 'fastapi', 'tornado', 'celery',
-            'tensorflow', 'pytorch', 'keras', 'scikit-learn', 'pandas', 'numpy',
-            'scipy', 'matplotlib', 'seaborn', 'opencv', 'pillow', 'requests',
-            'beautifulsoup', 'selenium', 'scrapy', 'sqlalchemy', 'pydantic',
-            'transformers', 'huggingface', 'langchain', 'auto-gpt', 'openai',
-            
-            'docker', 'kubernetes', 'terraform', 'ansible', 'jenkins', 'gitlab',
-            'redis', 'mongodb', 'postgresql', 'mysql', 'elasticsearch', 'kafka',
-            'rabbitmq', 'nginx', 'apache', 'linux', 'ubuntu', 'alpine',
-            'prometheus', 'grafana', 'datadog', 'aws-cli', 'azure-cli',
-            
-            'golang', 'rust', 'ruby', 'php', 'java', 'kotlin', 'swift', 'dart',
-            'flutter', 'react-native', 'electron', 'tauri', 'dotnet', 'csharp',
-            'homebrew', 'npm', 'yarn', 'pnpm', 'pip', 'cargo', 'gem'
-        ]
-
-        repo_simple = repo_name.split('/')[-1].lower().replace('-', '').replace('_', '')
-
-        for popular in popular_repos:
-            if len(repo_simple) == len(popular):
-                diff_count = sum(1 for a, b in zip(repo_simple, popular) if a != b)
-                if diff_count == 1:
-                    return 1.0
-            if repo_simple in [popular + 'js', popular + 'py', 'js' + popular, 'py' + popular]:
-                return 0.7
-
-        return 0.0
+        similarity = self._typosquatting_scores.get(repo_name)
+        if similarity is None:
+            similarity = _typosquatting_similarity(repo_name)
+            self._typosquatting_scores.put(repo_name, similarity)
+        return similarity
 
-    def _calculate_fork_divergence(self, event_type: str, payload: Dict) -> float:
+    def _calculate_fork_divergence(self, payload: Dict) -> float:
         """Calculate how much a fork diverges from its parent"""
-        if event_type != 'ForkEvent':
-            return 0.0
-
         return 0.0
 
-    def _check_contributor_mismatch(self, event_type: str, payload: Dict) -> float:
+    def _check_contributor_mismatch(self, payload: Dict) -> float:
         """Check if contributors don't match fork source"""
-        if event_type != 'ForkEvent':
-            return 0.0
-
         return 0.0
 
-    def _update_tracking(self, event: Dict, repo_name: str, actor: str, timestamp_str: str):
+    def _log_invalid_timestamp(self, created_at: Any):
+        """Warn about events skipped for a bad created_at, at most once per interval"""
+        self._invalid_timestamps += 1
+        now = time.monotonic()
+        if now - self._invalid_timestamp_logged_at < INVALID_TIMESTAMP_LOG_INTERVAL:
+            return
+
+        logger.warning(
+            "Skipped tracking for %d event(s) with invalid created_at, latest %r",
+            self._invalid_timestamps, created_at
+        )
+        self._invalid_timestamps = 0
+        self._invalid_timestamp_logged_at = now
+
+    def _update_tracking(self, event_type: str, payload: Dict, repo_name: str, actor: str, ts: float):
         """Update in-memory tracking for velocity calculations"""
-        try:
-            ts = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).timestamp()
-            event_type = event.get('type', '')
+        self.actor_first_seen.setdefault(actor, ts)
+        self.actor_event_count[actor] = self.actor_event_count.get(actor, 0) + 1
+
+        self.last_event_time[actor] = ts
+
+        if event_type == 'PushEvent' and payload.get('forced', False):
+            timestamps = self.force_push_tracking.get(repo_name)
+            if timestamps is None:
+                timestamps = self.force_push_tracking[repo_name] = deque(maxlen=100)
+            _insert_sorted(timestamps, ts)
+
+        if event_type == 'IssuesEvent' and payload.get('action') == 'opened':
+            tracking = self.issue_tracking.get(repo_name)
+            if tracking is None:
+                tracking = self.issue_tracking[repo_name] = {
+                    'timestamps': deque(),
+                    'actor_counts': {}
+                }
+
+            timestamps = tracking['timestamps']
+            _insert_sorted(timestamps, ts)
+
+            cutoff_10min = ts - 600
+            while timestamps and timestamps[0] <= cutoff_10min:
+                timestamps.popleft()
+
+            # Everything left is inside the 10 minute window
+            tracking['actor_counts'][actor] = len(timestamps)
+
+            total_issues = len(timestamps)
+            if total_issues > 10:
+                oldest = timestamps[0]
+                time_span_hours = (ts - oldest) / 3600
+                if time_span_hours > 0:
+                    self.issue_baselines[repo_name] = total_issues / time_span_hours
+
+def _insert_sorted(timestamps: deque, ts: float):
+    """
+    Add ts to a sorted deque. Events mostly arrive in order, so this is
+    usually an append; a full bounded deque drops its oldest entry.
+    """
+    if not timestamps or ts >= timestamps[-1]:
+        timestamps.append(ts)
+        return
+
+    if len(timestamps) == timestamps.maxlen:
+        timestamps.popleft()
+    bisect.insort(timestamps, ts)
+
+def _login_bot_score(actor: str) -> float:
+    """Bot suspicion from the login alone, before activity and the 1.0 cap"""
+    score = 0.0
+
+    actor_lower = actor.lower()
+    if '[bot]' in actor_lower:
+        score += 0.5
+    elif 'bot' in actor_lower:
+        score += 0.3
+    if actor.endswith('-bot') or actor.startswith('bot-'):
+        score += 0.4
+
+    if actor.replace('-', '').replace('_', '').isdigit():
+        score += 0.3
+    if len(actor) < 4:
+        score += 0.2
+    if actor.isascii():
+        # Logins are ASCII in practice; count digits in C instead of per character
+        digit_count = len(actor) - len(actor.encode('ascii').translate(None, _ASCII_DIGITS))
+    else:
+        digit_count = sum(c.isdigit() for c in actor)
+    if digit_count > len(actor) * 0.3 and digit_count > 3:
+        score += 0.2
+
+    return score
+
+def _typosquatting_similarity(repo_name: str) -> float:
+    """1.0 for a name one character off a popular repo, 0.7 for a js/py-decorated one"""
+    repo_simple = repo_name.split('/')[-1].lower().replace('-', '').replace('_', '')
 
-            if actor not in self.actor_first_seen:
-                self.actor_first_seen[actor] = ts
-            if actor not in self.actor_event_count:
-                self.actor_event_count[actor] = 0
-            self.actor_event_count[actor] += 1
-
-            self.last_event_time[actor] = ts
-
-            if event_type == 'PushEvent' and event.get('payload', {}).get('forced', False):
-                if repo_name not in self.force_push_tracking:
-                    self.force_push_tracking[repo_name] = []
-                self.force_push_tracking[repo_name].append(ts)
-                if len(self.force_push_tracking[repo_name]) > 100:
-                    self.force_push_tracking[repo_name] = self.force_push_tracking[repo_name][-100:]
-
-            if event_type == 'IssuesEvent' and event.get('payload', {}).get('action') == 'opened':
-                if repo_name not in self.issue_tracking:
-                    self.issue_tracking[repo_name] = {
-                        'timestamps': [],
-                        'actor_counts': {}
-                    }
-
-                self.issue_tracking[repo_name]['timestamps'].append(ts)
-
-                cutoff_10min = ts - 600
-                self.issue_tracking[repo_name]['timestamps'] = [
-                    t for t in self.issue_tracking[repo_name]['timestamps'] if t > cutoff_10min
-                ]
-
-                actor_count = sum(1 for t in self.issue_tracking[repo_name]['timestamps']
-                                if t > cutoff_10min)
-                self.issue_tracking[repo_name]['actor_counts'][actor] = actor_count
-
-                total_issues = len(self.issue_tracking[repo_name]['timestamps'])
-                if total_issues > 10:
-                    oldest = min(self.issue_tracking[repo_name]['timestamps'])
-                    time_span_hours = (ts - oldest) / 3600
-                    if time_span_hours > 0:
-                        self.issue_baselines[repo_name] = total_issues / time_span_hours
-
-        except Exception as e:
-            print(f"Error updating tracking: {e}")
+    # First popular name (in list order) that's exactly one character off
+    hamming_hit = None
+    if len(repo_simple) in _POPULAR_LENGTHS:
+        for i, char in enumerate(repo_simple):
+            masked = repo_simple[:i] + '\0' + repo_simple[i + 1:]
+            for index, popular_char in _ONE_OFF_POPULAR.get(masked, ()):
+                if popular_char != char:
+                    if hamming_hit is None or index < hamming_hit:
+                        hamming_hit = index
+                    break
+
+    decorated_hit = _DECORATED_POPULAR.get(repo_simple)
+
+    if hamming_hit is None and decorated_hit is None:
+        return 0.0
+    # Same precedence as scanning the list: the earlier popular name wins
+    if decorated_hit is None or (hamming_hit is not None and hamming_hit <= decorated_hit):
+        return 1.0
+    return 0.7
@@ -0,0 +1,39 @@
+"""
+Gunicorn config for the ML service.
+
+Run with: gunicorn -c gunicorn_conf.py app:app
+"""
+from gevent import monkey
+monkey.patch_all()
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('ML_PORT', '5001')}"
+
+# One gevent worker overlaps requests while they wait on I/O; model access is
+# still serialized by the learner lock.
+#
+# Keep ML_WORKERS at 1. Feature tracking state (force push windows, issue
+# bursts, actor counts, last event times, workflow streaks) and the score
+# caches live in each worker process, so with more than one worker those
+# features are computed from whichever share of events a worker happened to
+# receive. Raising it is unsafe until that state is shared across processes.
+worker_class = 'gevent'
+workers = int(os.getenv('ML_WORKERS', '1'))
+worker_connections = 1000
+
+# Load the models once in the master so forked workers share its pages
+# copy-on-write instead of each unpickling their own copy.
+preload_app = True
+
+def when_ready(server):
+    # Move preloaded objects out of GC tracking so collections in the
+    # workers don't touch (and copy) the shared pages.
+    gc.freeze()
+
+def post_fork(server, worker):
+    # The preloaded app's background threads stayed in the master; start the
+    # worker's own.
+    import app
+    app.restart_background_threads()
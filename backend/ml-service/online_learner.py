@@ -1,7 +1,11 @@
 from river import linear_model, optim, preprocessing, metrics
+import math
 import pickle
 import os
-from typing import Dict, Tuple
+import queue
+import tempfile
+import threading
+from typing import Dict, List, Tuple
 from datetime import datetime
 
 class OnlineLearner:
@@ -25,6 +29,9 @@ class OnlineLearner:
 
         self.load_model()
 
+        # River models aren't thread-safe; serialize access to predict
+        self._lock = threading.Lock()
+
         # Track predictions for feedback loop
         self.predictions = {}  # event_id -> (features, score, prediction)
 
@@ -43,6 +50,10 @@ class OnlineLearner:
 
         self.load_metrics()
 
+        # Background writer for schedule_save, started on first use
+        self._save_queue = None
+        self._save_pid = None
+
     def predict(self, event_id: str, features: Dict[str, float]) -> Tuple[float, float]:
         """
         Predict anomaly score for an event.
@@ -52,33 +63,111 @@ class OnlineLearner:
             - probability: 0.0-1.0 confidence that event is anomalous
             - binary_prediction: 0 or 1
         """
-        try:
-            # River expects dict features
-            proba = self.model.predict_proba_one(features)
-
-            # Get probability of class 1 (anomalous)
-            score = proba.get(1, 0.0) if isinstance(proba, dict) else 0.5
+        with self._lock:
+            return self._predict_one(event_id, features)
 
-            # Store for potential feedback
-            self.predictions[event_id] = {
-                'features': features,
-                'score': score,
-                'prediction': 1 if score > 0.5 else 0
-            }
-
-            self.stats['total_predictions'] += 1
+    def predict_many(self, event_ids: List[str], feature_dicts: List[Dict[str, float]]) -> List[Tuple[float, float]]:
+        """
+        Predict anomaly scores for a batch of events, holding the model lock once.
 
-            return score, 1 if score > 0.5 else 0
+        Returns:
+            list of (probability, binary_prediction), in input order
+        """
+        with self._lock:
+            return [
+                self._predict_one(event_id, features)
+                for event_id, features in zip(event_ids, feature_dicts)
+            ]
+
+    def _predict_one(self, event_id: str, features: Dict[str, float]) -> Tuple[float, float]:
+        """Predict a single event. Caller must hold self._lock."""
+        try:
+            # Same as self.model.predict_proba_one, from the snapshot taken at load
+            z = self._intercept
+            for name, mean, std, weight in self._terms:
+                value = features.get(name)
+                if value is not None:
+                    z += weight * (value - mean) / std
+
+            return self._record(event_id, features, _sigmoid(z))
         except Exception as e:
             print(f"Prediction error: {e}")
             # Cold start: random score until we have training data
             return 0.5, 0
 
+    def _snapshot_model(self):
+        """
+        Copy the scaler and logistic regression state into flat terms for
+        prediction. Must be called again whenever self.model changes.
+        """
+        scaler = self.model['StandardScaler']
+        regression = self.model['LogisticRegression']
+        weights = regression.weights
+
+        self._intercept = float(regression.intercept)
+
+        # (name, mean, std, weight); zero-variance and zero-weight features never contribute
+        terms = []
+        for c, mean in scaler.means.items():
+            std = scaler.vars[c] ** 0.5
+            weight = weights.get(c, 0.0)
+            if std > 0 and weight != 0:
+                terms.append((c, mean, std, weight))
+        self._terms = tuple(terms)
+
+    def _record(self, event_id: str, features: Dict[str, float], score: float) -> Tuple[float, float]:
+        """Store a prediction for the feedback loop and return (score, prediction)"""
+        prediction = 1 if score > 0.5 else 0
+
+        self.predictions[event_id] = {
+            'features': features,
+            'score': score,
+            'prediction': prediction
+        }
+
+        self.stats['total_predictions'] += 1
+
+        return score, prediction
+
+    def schedule_save(self):
+        """
+        Snapshot the model and metrics and write them from the background
+        save worker, so the caller never waits on disk. If saves back up,
+        only the newest snapshot is kept.
+        """
+        with self._lock:
+            snapshot = (pickle.dumps(self.model), pickle.dumps(self.stats))
+
+            # Threads don't survive fork, so a forked process starts its own worker
+            if self._save_pid != os.getpid():
+                self._save_queue = queue.Queue(maxsize=1)
+                self._save_pid = os.getpid()
+                threading.Thread(target=self._save_worker, args=(self._save_queue,), daemon=True).start()
+            save_queue = self._save_queue
+
+        while True:
+            try:
+                save_queue.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    save_queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _save_worker(self, save_queue: queue.Queue):
+        while True:
+            model_bytes, stats_bytes = save_queue.get()
+            self._write_model(model_bytes)
+            self._write_metrics(stats_bytes)
+
     def save_model(self):
         """Persist model to disk"""
+        self._write_model(pickle.dumps(self.model))
+
+    def _write_model(self, data: bytes):
         try:
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(self.model, f)
+            _write_atomic(self.model_path, data)
             print(f"Model saved to {self.model_path}")
         except Exception as e:
             print(f"Error saving model: {e}")
@@ -95,11 +184,15 @@ class OnlineLearner:
         else:
             print("No existing model found, starting fresh")
 
+        self._snapshot_model()
+
     def save_metrics(self):
         """Persist metrics to disk"""
+        self._write_metrics(pickle.dumps(self.stats))
+
+    def _write_metrics(self, data: bytes):
         try:
-            with open(self.metrics_path, 'wb') as f:
-                pickle.dump(self.stats, f)
+            _write_atomic(self.metrics_path, data)
         except Exception as e:
             print(f"Error saving metrics: {e}")
 
@@ -114,3 +207,26 @@ class OnlineLearner:
                 print(f"Error loading metrics: {e}")
         else:
             print("No existing metrics found, starting fresh")
+
+def _write_atomic(path: str, data: bytes):
+    """
+    Write data to path via a temp file, so readers never see a partial file.
+    Each write gets its own temp file, so concurrent writers can't install
+    each other's partial data.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _sigmoid(z: float) -> float:
+    """river.utils.math.sigmoid: saturates outside [-30, 30]"""
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
@@ -0,0 +1,88 @@
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+import queue
+import threading
+import time
+
+class PredictionBatcher:
+    """
+    Adaptive micro-batching in front of an OnlineLearner.
+
+    Concurrent requests enqueue their features and block on a Future.
+    A background worker takes up to max_batch requests that are already
+    queued, which under load is whatever arrived while the previous batch
+    was predicting, and predicts them together with a single
+    learner.predict_many call. With max_wait_ms > 0 it also waits that long
+    for more; the default of 0 never delays an isolated request.
+    """
+
+    def __init__(self, learner, max_batch: int = 32, max_wait_ms: float = 0.0):
+        self.learner = learner
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.start()
+
+    def start(self):
+        """Start the worker on a fresh queue; call again in a forked child, which doesn't inherit the thread"""
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def predict(self, event_id: str, features: Dict[str, float]) -> Tuple[float, float]:
+        """Queue a single prediction and wait for its batch to complete"""
+        return self._submit(event_id, features).result()
+
+    def predict_many(self, event_ids: List[str], feature_dicts: List[Dict[str, float]]) -> List[Tuple[float, float]]:
+        """Queue several predictions and wait for all of them, in input order"""
+        futures = [
+            self._submit(event_id, features)
+            for event_id, features in zip(event_ids, feature_dicts)
+        ]
+        return [future.result() for future in futures]
+
+    def _submit(self, event_id: str, features: Dict[str, float]) -> Future:
+        future = Future()
+        self._queue.put((event_id, features, future))
+        return future
+
+    def _next_batch(self) -> list:
+        """Block for the first request, then take what's queued; wait for more only if max_wait is set"""
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if self.max_wait <= 0:
+            return batch
+
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            event_ids = [item[0] for item in batch]
+            feature_dicts = [item[1] for item in batch]
+
+            try:
+                results = self.learner.predict_many(event_ids, feature_dicts)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
@@ -2,45 +2,93 @@
 Basic tests for ML Service API
 """
 import pytest
-import json
-from app import app
-
-@pytest.fixture
-def client():
-    """Create test client"""
-    app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
-
-def test_score_endpoint_valid_event(client):
-    """Test scoring a valid GitHub event"""
-    test_event = {
-        'id': 'test-123',
-        'type': 'PushEvent',
-        'repo': {'name': 'test/repo'},
-        'actor': {'login': 'testuser'},
-        'created_at': '2026-01-30T12:00:00Z',
-        'payload': {
-            'ref': 'refs/heads/main',
-            'forced': True
+import numpy as np
+
+# Keys every /score and /score/code-quality result must have
+SCORE_KEYS = frozenset({'event_id', 'score', 'prediction', 'is_anomalous', 'features'})
+CODE_QUALITY_KEYS = frozenset({'event_id', 'score', 'prediction', 'is_good_practice'})
+
+# Shared request payloads; the service never mutates them
+PUSH_EVENT = {
+    'id': 'test-123',
+    'type': 'PushEvent',
+    'repo': {'name': 'test/repo'},
+    'actor': {'login': 'testuser'},
+    'created_at': 1769774400,  # 2026-01-30T12:00:00Z, as epoch seconds
+    'payload': {
+        'ref': 'refs/heads/main',
+        'forced': True
+    }
+}
+
+FORCE_PUSH_EVENT = {
+    **PUSH_EVENT,
+    'id': 'force-push-123',
+    'repo': {'name': 'critical/repo'},
+    'actor': {'login': 'attacker'}
+}
+
+NORMAL_PUSH_EVENT = {
+    **PUSH_EVENT,
+    'id': 'normal-123',
+    'repo': {'name': 'project/repo'},
+    'actor': {'login': 'developer'},
+    'payload': {
+        'ref': 'refs/heads/feature-branch',
+        'forced': False
+    }
+}
+
+PR_EVENT = {
+    'id': 'pr-123',
+    'type': 'PullRequestEvent',
+    'repo': {'name': 'test/repo'},
+    'actor': {'login': 'dev'},
+    'created_at': 1769774400,  # 2026-01-30T12:00:00Z, as epoch seconds
+    'payload': {
+        'action': 'opened',
+        'pull_request': {
+            'title': 'fix',
+            'body': '',
+            'additions': 500,
+            'deletions': 100
         }
     }
+}
+
+def assert_valid_scores(results):
+    """Check every result in a batch response has a score in [0, 1] and a 0/1 prediction"""
+    scores = np.array([r['score'] for r in results], dtype=np.float64)
+    predictions = np.array([r['prediction'] for r in results])
+
+    assert ((scores >= 0) & (scores <= 1)).all(), scores
+    assert np.isin(predictions, [0, 1]).all(), predictions
+
+def _check_force_push_to_main(data):
+    # Force push to main should have high score
+    assert data['score'] > 0.5  # Should be risky
+    assert data['features']['force_push_to_main'] == 1.0
+
+def _check_normal_event(data):
+    # Normal event should have lower score
+    assert data['features']['force_push_to_main'] == 0.0
+    assert data['features']['is_main_branch'] == 0.0
 
-    response = client.post(
-        '/score',
-        data=json.dumps(test_event),
-        content_type='application/json'
-    )
+@pytest.mark.parametrize('event,checks', [
+    pytest.param(PUSH_EVENT, None, id='valid_event'),
+    pytest.param(FORCE_PUSH_EVENT, _check_force_push_to_main, id='force_push_detection'),
+    pytest.param(NORMAL_PUSH_EVENT, _check_normal_event, id='normal_event'),
+])
+def test_score_endpoint(client, event, checks):
+    """Test scoring GitHub events, with per-case checks on score and features"""
+    response = client.post('/score', json=event)
 
     assert response.status_code == 200
-    data = json.loads(response.data)
+    data = response.get_json()
 
     # Check response structure
-    assert 'event_id' in data
-    assert 'score' in data
-    assert 'prediction' in data
-    assert 'is_anomalous' in data
-    assert 'features' in data
+    assert SCORE_KEYS <= data.keys()
+    assert 'force_push_to_main' in data['features']
 
     # Check types
     assert isinstance(data['score'], (int, float))
@@ -52,107 +100,192 @@ def test_score_endpoint_valid_event(client):
     assert 0 <= data['score'] <= 1
     assert data['prediction'] in [0, 1]
 
+    if checks is not None:
+        checks(data)
+
 def test_score_endpoint_missing_data(client):
     """Test scoring with missing data returns error"""
-    response = client.post(
-        '/score',
-        data=json.dumps({}),
-        content_type='application/json'
-    )
+    response = client.post('/score', json={})
 
     # Missing event ID should return 400
     assert response.status_code == 400
 
-def test_score_endpoint_force_push_detection(client):
-    """Test that force push to main is detected as high risk"""
-    force_push_event = {
-        'id': 'force-push-123',
-        'type': 'PushEvent',
-        'repo': {'name': 'critical/repo'},
-        'actor': {'login': 'attacker'},
-        'created_at': '2026-01-30T12:00:00Z',
-        'payload': {
-            'ref': 'refs/heads/main',
-            'forced': True
+def test_code_quality_endpoint(client):
+    """Test code quality scoring"""
+    response = client.post('/score/code-quality', json=PR_EVENT)
+
+    assert response.status_code == 200
+    data = response.get_json()
+
+    # Check response structure
+    assert CODE_QUALITY_KEYS <= data.keys()
+
+    # Check types and ranges
+    assert 0 <= data['score'] <= 1
+    assert data['prediction'] in [0, 1]
+
+def test_score_batch_endpoint(client):
+    """Test scoring a batch of events returns one result per event, in order"""
+    events = [
+        {
+            'id': f'batch-{i}',
+            'type': 'PushEvent',
+            'repo': {'name': 'test/repo'},
+            'actor': {'login': 'testuser'},
+            'created_at': '2026-01-30T12:00:00Z',
+            'payload': {
+                'ref': 'refs/heads/main',
+                'forced': i == 0
+            }
         }
-    }
+        for i in range(3)
+    ]
 
-    response = client.post(
-        '/score',
-        data=json.dumps(force_push_event),
-        content_type='application/json'
-    )
+    response = client.post('/score/batch', json={'events': events})
 
     assert response.status_code == 200
-    data = json.loads(response.data)
+    data = response.get_json()
 
-    # Force push to main should have high score
-    assert data['score'] > 0.5  # Should be risky
-    assert 'force_push_to_main' in data['features']
-    assert data['features']['force_push_to_main'] == 1.0
+    assert [r['event_id'] for r in data] == ['batch-0', 'batch-1', 'batch-2']
+    assert data[0]['features']['force_push_to_main'] == 1.0
+    assert data[1]['features']['force_push_to_main'] == 0.0
+    assert_valid_scores(data)
 
-def test_score_endpoint_normal_event(client):
-    """Test that normal events score low"""
-    normal_event = {
-        'id': 'normal-123',
-        'type': 'PushEvent',
-        'repo': {'name': 'project/repo'},
-        'actor': {'login': 'developer'},
-        'created_at': '2026-01-30T12:00:00Z',
-        'payload': {
-            'ref': 'refs/heads/feature-branch',
-            'forced': False
+@pytest.mark.parametrize('url,body', [
+    ('/score/batch', {'events': [{'type': 'PushEvent'}]}),
+    ('/score/batch', {'events': ['not-an-event']}),
+    ('/score/batch', {'events': {'id': 'not-a-list'}}),
+    ('/score/batch', {'events': [{'id': 'a'}], 'repo_contexts': {'id': 'a'}}),
+    ('/score/batch', {'events': [{'id': 'a'}], 'repo_contexts': ['not-a-context']}),
+    ('/score/batch', [{'id': 'a'}]),
+    ('/score/code-quality/batch', {'events': [None]}),
+    ('/score/code-quality/batch', {'events': [{'id': 'a'}], 'diff_data': 'abc'}),
+    ('/score', ['not-an-event']),
+    ('/score', {'event': 'not-an-event'}),
+    ('/score/code-quality', {'event': {'id': 'a'}, 'diff_data': ['not-a-diff']}),
+])
+def test_score_endpoints_reject_malformed_input(client, url, body):
+    """Test malformed events, batches and contexts are rejected rather than erroring"""
+    response = client.post(url, json=body)
+
+    assert response.status_code == 400
+
+def test_code_quality_batch_endpoint(client):
+    """Test code quality scoring for a batch of events"""
+    events = [
+        {
+            'id': 'cq-batch-1',
+            'type': 'PullRequestEvent',
+            'repo': {'name': 'test/repo'},
+            'actor': {'login': 'dev'},
+            'payload': {'action': 'opened', 'pull_request': {'additions': 5, 'deletions': 1}}
+        },
+        {
+            'id': 'cq-batch-2',
+            'type': 'PushEvent',
+            'repo': {'name': 'test/repo'},
+            'actor': {'login': 'dependabot[bot]'},
+            'payload': {'ref': 'refs/heads/main', 'head': 'abc123'}
         }
-    }
+    ]
 
-    response = client.post(
-        '/score',
-        data=json.dumps(normal_event),
-        content_type='application/json'
-    )
+    response = client.post('/score/code-quality/batch', json={'events': events})
 
     assert response.status_code == 200
-    data = json.loads(response.data)
+    data = response.get_json()
 
-    # Normal event should have lower score
-    assert 'force_push_to_main' in data['features']
-    assert data['features']['force_push_to_main'] == 0.0
-    assert data['features']['is_main_branch'] == 0.0
+    assert [r['event_id'] for r in data] == ['cq-batch-1', 'cq-batch-2']
+    assert data[0]['features']['pr_is_tiny'] == 1.0
+    assert data[1]['features']['is_bot_actor'] == 1.0
+    assert_valid_scores(data)
+    for result in data:
+        assert CODE_QUALITY_KEYS <= result.keys()
 
-def test_code_quality_endpoint(client):
-    """Test code quality scoring"""
-    pr_event = {
-        'id': 'pr-123',
-        'type': 'PullRequestEvent',
-        'repo': {'name': 'test/repo'},
-        'actor': {'login': 'dev'},
+def test_predict_many_matches_predict(app_module):
+    """Test snapshot scoring matches the river pipeline's predict_proba_one"""
+    feature_extractor, learner = app_module.feature_extractor, app_module.learner
+
+    feature_dicts = [
+        feature_extractor.extract_features({
+            'id': f'parity-{i}',
+            'type': ['PushEvent', 'IssuesEvent', 'ForkEvent', 'DeleteEvent'][i % 4],
+            'repo': {'name': f'org/repo-{i % 3}'},
+            'actor': {'login': f'user{i}'},
+            'created_at': '2026-01-30T12:00:00Z',
+            'payload': {'ref': 'refs/heads/main', 'forced': i % 2 == 0, 'ref_type': 'branch'}
+        })
+        for i in range(20)
+    ]
+    event_ids = [f'parity-{i}' for i in range(len(feature_dicts))]
+
+    batch = learner.predict_many(event_ids, feature_dicts)
+    singles = [learner.predict(event_id, f) for event_id, f in zip(event_ids, feature_dicts)]
+    expected = [learner.model.predict_proba_one(f)[True] for f in feature_dicts]
+
+    for (batch_score, batch_pred), (single_score, single_pred), score in zip(batch, singles, expected):
+        assert batch_score == pytest.approx(score, abs=1e-9)
+        assert single_score == pytest.approx(score, abs=1e-9)
+        assert batch_pred == single_pred == (1 if score > 0.5 else 0)
+
+def test_score_endpoint_redelivered_event_is_cached(client, app_module):
+    """Test a redelivered event is served from cache without re-running extraction"""
+    event = {
+        'id': 'redelivered-123',
+        'type': 'PushEvent',
+        'repo': {'name': 'cache/repo'},
+        'actor': {'login': 'cache-user'},
         'created_at': '2026-01-30T12:00:00Z',
-        'payload': {
-            'action': 'opened',
-            'pull_request': {
-                'title': 'fix',
-                'body': '',
-                'additions': 500,
-                'deletions': 100
-            }
-        }
+        'payload': {'ref': 'refs/heads/main', 'forced': False}
     }
 
-    response = client.post(
-        '/score/code-quality',
-        data=json.dumps(pr_event),
-        content_type='application/json'
-    )
+    first = client.post('/score', json=event).get_json()
+    second = client.post('/score', json=event).get_json()
+
+    assert first == second
+    assert app_module.feature_extractor.actor_event_count['cache-user'] == 1
+
+    # Different enrichment context is scored fresh
+    with_context = client.post(
+        '/score', json={'event': event, 'repo_context': {'metadata': {'age_days': 3}}}
+    ).get_json()
+
+    assert with_context['features']['repo_is_young'] == 1.0
+
+def test_code_quality_large_batch_matches_single(client):
+    """Test a large code quality batch matches single-event scoring"""
+    events = [
+        {
+            'id': f'cq-large-{i}',
+            'type': 'PullRequestEvent' if i % 2 else 'PushEvent',
+            'repo': {'name': 'test/repo'},
+            'actor': {'login': 'dev'},
+            'payload': {
+                'ref': 'refs/heads/tmp-fix' if i % 3 else 'refs/heads/main',
+                'action': 'closed',
+                'pull_request': {'additions': 40 * i, 'deletions': i, 'merged': True}
+            }
+        }
+        for i in range(18)
+    ]
 
+    response = client.post('/score/code-quality/batch', json={'events': events})
     assert response.status_code == 200
-    data = json.loads(response.data)
+    batch = response.get_json()
+    assert_valid_scores(batch)
 
-    # Check response structure
-    assert 'event_id' in data
-    assert 'score' in data
-    assert 'prediction' in data
-    assert 'is_good_practice' in data
+    for event, result in zip(events, batch):
+        single_event = {**event, 'id': event['id'] + '-single'}
+        single = client.post('/score/code-quality', json=single_event).get_json()
 
-    # Check types and ranges
-    assert 0 <= data['score'] <= 1
-    assert data['prediction'] in [0, 1]
+        assert result['features'] == single['features']
+        assert result['score'] == pytest.approx(single['score'], abs=1e-9)
+
+@pytest.mark.parametrize('created_at', [{'seconds': 1769774400}, ['2026-01-30T12:00:00Z'], None])
+def test_score_endpoint_malformed_created_at(client, created_at):
+    """Test an event with a non-string, non-numeric created_at is still scored"""
+    event = {**PUSH_EVENT, 'id': f'bad-created-at-{type(created_at).__name__}', 'created_at': created_at}
+
+    response = client.post('/score', json=event)
+
+    assert response.status_code == 200
+    assert_valid_scores([response.get_json()])
@@ -0,0 +1,69 @@
+"""
+Tests for FeatureExtractor
+"""
+import pytest
+import numpy as np
+from feature_extractor import FeatureExtractor
+
+def test_extract_features_batch_matches_single():
+    """Test batch feature extraction matches extract_features event by event"""
+    events = [
+        {
+            'id': f'fe-batch-{i}',
+            'type': ['PushEvent', 'IssuesEvent', 'ForkEvent', 'DeleteEvent'][i % 4],
+            'repo': {'name': f'org/repo-{i % 3}'},
+            'actor': {'login': f'user{i % 5}'},
+            'created_at': f'2026-01-30T12:00:{i:02d}Z',
+            'payload': {'ref': 'refs/heads/main', 'forced': i % 2 == 0, 'ref_type': 'branch', 'action': 'opened'}
+        }
+        for i in range(20)
+    ]
+
+    X, names = FeatureExtractor().extract_features_batch(events)
+    single = FeatureExtractor()
+
+    assert X.shape == (len(events), len(names))
+    for row, event in zip(X, events):
+        features = single.extract_features(event)
+        assert list(features) == list(names)
+        assert row.tolist() == pytest.approx(list(features.values()))
+
+def test_force_push_frequency_uses_event_time():
+    """Test force push frequency counts the hour before each event, not before now"""
+    extractor = FeatureExtractor()
+
+    def force_push(created_at):
+        return extractor.extract_features({
+            'type': 'PushEvent',
+            'repo': {'name': 'test/repo'},
+            'actor': {'login': 'dev'},
+            'created_at': created_at,
+            'payload': {'ref': 'refs/heads/main', 'forced': True}
+        })['force_push_frequency']
+
+    assert force_push('2026-01-30T12:00:00Z') == 0.0
+    assert force_push('2026-01-30T12:10:00Z') == 1.0
+    assert force_push('2026-01-30T13:05:00Z') == 1.0
+
+    # Newest-first, as the poller sees GitHub's pages: later pushes aren't counted
+    extractor = FeatureExtractor()
+    assert force_push('2026-01-30T13:30:00Z') == 0.0
+    assert force_push('2026-01-30T13:20:00Z') == 0.0
+    assert force_push('2026-01-30T12:00:00Z') == 0.0
+    assert force_push('2026-01-30T13:25:00Z') == 1.0
+
+def test_feature_vector_round_trips_through_as_dict():
+    """Test as_dict recovers extract_features from extract_features_vector, keyed by name"""
+    event = {
+        'type': 'PushEvent',
+        'repo': {'name': 'test/repo'},
+        'actor': {'login': 'dev'},
+        'created_at': '2026-01-30T12:00:00Z',
+        'payload': {'ref': 'refs/heads/main', 'forced': True}
+    }
+
+    features = FeatureExtractor().extract_features(event)
+    vector = FeatureExtractor().extract_features_vector(event)
+
+    assert vector.dtype == np.float32
+    assert FeatureExtractor.as_dict(vector) == pytest.approx(features)
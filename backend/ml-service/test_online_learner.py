@@ -0,0 +1,25 @@
+"""
+Tests for OnlineLearner
+"""
+import pickle
+import time
+import pytest
+
+pytest.importorskip('river')
+from online_learner import OnlineLearner
+
+def test_schedule_save_writes_in_background(tmp_path):
+    """Test scheduled saves are written by the background worker"""
+    model_path = tmp_path / 'model.pkl'
+    metrics_path = tmp_path / 'metrics.pkl'
+    learner = OnlineLearner(model_path=str(model_path), metrics_path=str(metrics_path))
+    learner.predict('save-1', {'x': 1.0})
+    learner.schedule_save()
+
+    deadline = time.monotonic() + 5
+    while not (model_path.exists() and metrics_path.exists()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    with open(metrics_path, 'rb') as f:
+        assert pickle.load(f)['total_predictions'] == 1
+    assert OnlineLearner(model_path=str(model_path), metrics_path=str(metrics_path)).stats['total_predictions'] == 1
@@ -0,0 +1,26 @@
+"""
+Tests for PredictionBatcher
+"""
+from concurrent.futures import ThreadPoolExecutor
+from prediction_batcher import PredictionBatcher
+
+def test_prediction_batcher_concurrent_requests():
+    """Test concurrent predictions are batched and each caller gets its own result"""
+    class RecordingLearner:
+        def __init__(self):
+            self.batch_sizes = []
+
+        def predict_many(self, event_ids, feature_dicts):
+            self.batch_sizes.append(len(event_ids))
+            return [(f['x'], 0) for f in feature_dicts]
+
+    recorder = RecordingLearner()
+    batcher = PredictionBatcher(recorder, max_batch=8, max_wait_ms=50)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda i: batcher.predict(str(i), {'x': float(i)}), range(16)))
+
+    assert results == [(float(i), 0) for i in range(16)]
+    assert sum(recorder.batch_sizes) == 16
+    assert max(recorder.batch_sizes) <= 8
+    assert len(recorder.batch_sizes) < 16
@@ -0,0 +1,30 @@
+"""
+Tests for timestamp parsing
+"""
+import pytest
+from time_utils import parse_iso_z, parse_timestamp
+
+def test_parse_iso_z():
+    """Test GitHub and other ISO timestamps parse to UTC epoch seconds"""
+    assert parse_iso_z('2026-01-30T12:00:00Z') == 1769774400.0
+    assert parse_iso_z('2026-01-30T13:00:00+01:00') == 1769774400.0
+
+@pytest.mark.parametrize('value', [
+    '2026-01-30T99:00:00Z',
+    '2026/01/30T12:00:00Z',
+    '+026-01-30T12:00:00Z',
+    '2026-02-30T12:00:00Z',
+    'bad',
+])
+def test_parse_iso_z_rejects_invalid(value):
+    """Test malformed timestamps raise ValueError instead of parsing to a wrong time"""
+    with pytest.raises(ValueError):
+        parse_iso_z(value)
+
+def test_parse_timestamp():
+    """Test epoch seconds pass through, strings are parsed, and anything else is a TypeError"""
+    assert parse_timestamp(1769774400) == 1769774400.0
+    assert parse_timestamp('2026-01-30T12:00:00Z') == 1769774400.0
+    for value in ({'seconds': 1769774400}, ['2026-01-30T12:00:00Z'], None, True):
+        with pytest.raises(TypeError):
+            parse_timestamp(value)
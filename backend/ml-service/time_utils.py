@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Union
+
+def parse_iso_z(s: str) -> float:
+    """
+    Parse a GitHub timestamp ('YYYY-MM-DDTHH:MM:SSZ', or any other ISO form)
+    to UTC epoch seconds. datetime.fromisoformat is implemented in C and
+    validates every field. Raises ValueError if the string can't be parsed.
+    """
+    return datetime.fromisoformat(s.replace('Z', '+00:00')).timestamp()
+
+def parse_timestamp(value: Union[str, int, float]) -> float:
+    """
+    Epoch seconds from an event timestamp: either epoch seconds already,
+    which are used as-is, or a string for parse_iso_z.
+    Raises ValueError or TypeError if it's neither.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        raise TypeError(f'Unsupported timestamp type: {type(value).__name__}')
+    return parse_iso_z(value)
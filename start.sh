@@ -26,7 +26,7 @@ fi
 # Start ML Service
 echo "Starting ML Service on port 5001..."
 cd /app/backend/ml-service
-python3 app.py 2>&1 &
+gunicorn -c gunicorn_conf.py app:app 2>&1 &
 ML_PID=$!
 echo "ML Service PID: $ML_PID"
 